@@ -1,31 +1,29 @@
-import csv
 import logging
-import random
-import pandas as pd
-import json
-from typing import List, Dict
-from datetime import datetime, timedelta
+import os
 
-# Path to the CSV file for storing prompts and responses
-DATA_FILE = "prompts_and_responses.csv"
+from batch_engine import BatchEngine
+from data_generation import DATA_FILE, PromptGenerator
+from entity_catalog import EntityCatalog
+from generate import main as cli_main
+from response_rules import load_rules
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Load entities from JSON files
-def load_entities(file_path: str) -> List[str]:
-    with open(file_path, 'r') as f:
-        return json.load(f)
+# Entity lists are resolved by name in this directory and loaded on first use
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+CATALOG = EntityCatalog(DATA_DIR)
 
-LOCATIONS = load_entities('locations.json')
-CROPS = load_entities('crops.json')
-ENTITIES = load_entities('entities.json')
+LOCATIONS = CATALOG['locations']
+CROPS = CATALOG['crops']
+ENTITIES = CATALOG['entities']
 
 # Additional dictionaries for more diverse prompts
 FARM_TYPES = ["organic", "conventional", "biodynamic", "permaculture", "hydroponic", "aquaponic", "vertical", "urban", "rooftop", "greenhouse", "open-field", "no-till", "conservation agriculture"]
 CHALLENGES = ["pest infestation", "soil erosion", "water scarcity", "climate change", "market fluctuations", "labor shortage", "increasing input costs", "crop diseases", "biodiversity loss", "soil degradation"]
 GOALS = ["increase yield", "improve soil health", "reduce water usage", "enhance biodiversity", "minimize chemical inputs", "optimize resource efficiency", "expand market reach", "implement sustainable practices", "reduce carbon footprint", "improve crop resilience"]
 TECHNIQUES = ["crop rotation", "companion planting", "integrated pest management", "cover cropping", "mulching", "composting", "precision agriculture", "agroforestry", "intercropping", "conservation tillage"]
+FARM_SIZES = [str(n) for n in range(1, 1001)]
 TIME_FRAMES = ["this growing season", "over the next five years", "in the long term", "year-round", "during the transition period", "in the off-season", "throughout the crop cycle"]
 
 # Enhanced prompt templates
@@ -47,82 +45,53 @@ PROMPT_TEMPLATES = [
     "A {farm_type} seed bank in {location} is working to preserve heirloom varieties of {crop1} and {crop2}. How can they use {entity} and {technique} to {goal} and ensure genetic diversity?",
 ]
 
-def generate_prompt() -> str:
-    """Generates a single, dynamic prompt using the templates and entities."""
-    template = random.choice(PROMPT_TEMPLATES)
-    return template.format(
-        location=random.choice(LOCATIONS),
-        farm_size=str(random.randint(1, 1000)),
-        farm_type=random.choice(FARM_TYPES),
-        crop1=random.choice(CROPS),
-        crop2=random.choice(CROPS),
-        entity=random.choice(ENTITIES),
-        challenge=random.choice(CHALLENGES),
-        goal=random.choice(GOALS),
-        technique=random.choice(TECHNIQUES),
-        time_frame=random.choice(TIME_FRAMES)
-    )
-
-def generate_fake_response(prompt: str) -> str:
-    """Generates a fake response based on keywords in the prompt."""
-    words = prompt.lower().split()
-    response_parts = []
-
-    if "organic" in words:
-        response_parts.append("Consider implementing organic pest control methods and natural fertilizers.")
-    if "climate change" in prompt.lower():
-        response_parts.append("Adapt crop varieties and planting schedules to changing climate patterns.")
-    if "water scarcity" in prompt.lower():
-        response_parts.append("Implement water-efficient irrigation systems like drip irrigation or rainwater harvesting.")
-    if "soil health" in prompt.lower():
-        response_parts.append("Focus on building organic matter through cover cropping and minimal tillage.")
-    if "biodiversity" in prompt.lower():
-        response_parts.append("Integrate polyculture systems and create habitat corridors for beneficial insects and wildlife.")
-
-    if not response_parts:
-        response_parts.append("Implement sustainable farming practices tailored to your specific crop and location.")
-        response_parts.append("Consult with local agricultural extension services for region-specific advice.")
-
-    return " ".join(response_parts)
-
-def generate_data(num_prompts: int) -> None:
-    """Generates synthetic data by creating prompts and fake responses."""
-    with open(DATA_FILE, "w", newline="", encoding="utf-8") as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(["Prompt", "Response", "Generation Date"])
-
-        for _ in range(num_prompts):
-            prompt = generate_prompt()
-            response = generate_fake_response(prompt)
-            generation_date = (datetime.now() - timedelta(days=random.randint(0, 365))).strftime("%Y-%m-%d")
-            writer.writerow([prompt, response, generation_date])
-            logging.info(f"Prompt: {prompt}\nResponse: {response}\nGeneration Date: {generation_date}\n")
-
-def analyze_data(data: pd.DataFrame) -> Dict[str, int]:
-    """Analyzes the generated data and returns some basic statistics."""
-    stats = {
-        "total_prompts": len(data),
-        "unique_crops": len(data['Prompt'].str.extractall(r'growing (\w+)')[0].unique()),
-        "unique_locations": len(data['Prompt'].str.extractall(r'in (\w+)')[0].unique()),
-        "challenges_mentioned": sum(data['Prompt'].str.contains('|'.join(CHALLENGES), case=False)),
-        "techniques_mentioned": sum(data['Prompt'].str.contains('|'.join(TECHNIQUES), case=False))
-    }
-    return stats
+# Values for each template slot, sampled uniformly by both generate_prompt and the batch engine.
+# Templates are checked against these names when the batch engine is built.
+SLOT_VALUES = {
+    "location": LOCATIONS,
+    "farm_size": FARM_SIZES,
+    "farm_type": FARM_TYPES,
+    "crop1": CROPS,
+    "crop2": CROPS,
+    "entity": ENTITIES,
+    "challenge": CHALLENGES,
+    "goal": GOALS,
+    "technique": TECHNIQUES,
+    "time_frame": TIME_FRAMES,
+}
+
+BATCH_ENGINE = BatchEngine(PROMPT_TEMPLATES, SLOT_VALUES)
+
+# Keyword rules behind the fake responses, matched against the sampled slots in bulk
+RESPONSE_RULES = load_rules(os.path.join(DATA_DIR, 'response-rules.json'))
+RESPONSE_RULES.compile_slots(BATCH_ENGINE)
+
+# Slot pairs whose joint frequencies are tracked while generating
+CO_OCCURRENCE_PAIRS = [("crop1", "crop2"), ("location", "crop1"), ("farm_type", "technique")]
+
+# With dedupe on, rows that differ only in these slots count as near duplicates
+NEAR_DUPLICATE_SLOTS = ["farm_size", "time_frame"]
+
+# Interchangeable slot pairs: swapping them gives a near duplicate, and with dedupe on they never repeat a value
+SYMMETRIC_SLOTS = [("crop1", "crop2")]
+
+# Slots kept balanced by stratified sampling, besides the template
+STRATIFY_SLOTS = ["location", "crop1"]
+
+# Runs the shared chunked, checkpointed generation loop over the data above
+GENERATOR = PromptGenerator("advanced", BATCH_ENGINE, RESPONSE_RULES, SLOT_VALUES, CO_OCCURRENCE_PAIRS,
+                            NEAR_DUPLICATE_SLOTS, SYMMETRIC_SLOTS, STRATIFY_SLOTS)
+
+new_stats = GENERATOR.new_stats
+generate_prompt = GENERATOR.generate_prompt
+generate_fake_response = GENERATOR.generate_fake_response
+generate_data = GENERATOR.generate_data
+generate_data_parallel = GENERATOR.generate_data_parallel
+analyze_data = GENERATOR.analyze_data
 
 def main():
-    num_prompts = 1000
-    generate_data(num_prompts)
-
-    # Read the CSV file
-    data = pd.read_csv(DATA_FILE)
-
-    # Analyze the data
-    stats = analyze_data(data)
-    logging.info("Data Analysis Results:")
-    for key, value in stats.items():
-        logging.info(f"{key}: {value}")
-
-    logging.info(f"Data for {num_prompts} prompts saved to {DATA_FILE}")
+    # Row count, output file and format, seed and the rest come from the shared command line
+    cli_main(generator_name="advanced")
 
 if __name__ == "__main__":
     main()
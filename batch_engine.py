@@ -0,0 +1,62 @@
+from typing import Dict, Sequence
+
+import numpy as np
+
+from templates import compile_templates
+
+class BatchEngine:
+    """Generates prompts in bulk by sampling slot indices for a whole chunk at once.
+
+    Every slot is sampled uniformly and independently, exactly like the
+    per-row ``random.choice`` calls in ``generate_prompt``, so the output
+    distribution is the same; only the cost per row changes. A slot is only
+    sampled for rows whose template uses it; other rows get index -1.
+
+    Slot values may be any sequence; ones with a ``take`` method (arrays and
+    catalog entity lists) are used as they are, so large lists stay lazy or
+    memory-mapped instead of being copied. A slot without values is refused.
+    """
+
+    def __init__(self, templates: Sequence[str], slots: Dict[str, Sequence[str]]):
+        self.templates = compile_templates(templates, slots)
+        self.values = {name: values if hasattr(values, "take") else np.asarray(list(values), dtype=object)
+                       for name, values in slots.items()}
+        # Catalog lists are checked when first loaded; lists given directly are checked now, so an empty one fails
+        # at startup instead of in the middle of a run
+        empty = [name for name, values in self.values.items() if isinstance(values, np.ndarray) and not len(values)]
+        if empty:
+            raise ValueError(f"Slots without any values: {', '.join(empty)}")
+        self.template_slots = [set(template.required) for template in self.templates]
+        # uses[name][t] is True when template t contains slot name
+        self.uses = {name: np.asarray([name in required for required in self.template_slots]) for name in self.values}
+
+    def sample(self, size: int, rng: np.random.Generator) -> Dict[str, np.ndarray]:
+        """Samples template and slot indices for ``size`` rows."""
+        template_idx = rng.integers(0, len(self.templates), size)
+        indices = {"template": template_idx}
+        for name, values in self.values.items():
+            used = self.uses[name][template_idx]
+            slot_idx = np.full(size, -1, dtype=np.int64)
+            slot_idx[used] = rng.integers(0, len(values), int(used.sum()))
+            indices[name] = slot_idx
+        return indices
+
+    def render(self, indices: Dict[str, np.ndarray]) -> np.ndarray:
+        """Renders sampled indices into prompts, one template group at a time."""
+        template_idx = indices["template"]
+        prompts = np.empty(len(template_idx), dtype=object)
+        for t, template in enumerate(self.templates):
+            rows = np.flatnonzero(template_idx == t)
+            if not rows.size:
+                continue
+            text = np.full(rows.size, template.literals[0], dtype=object)
+            for slot, literal in zip(template.slots, template.literals[1:]):
+                text = text + self.values[slot].take(indices[slot][rows])
+                if literal:
+                    text = text + literal
+            prompts[rows] = text
+        return prompts
+
+    def generate(self, size: int, rng: np.random.Generator) -> np.ndarray:
+        """Samples and renders ``size`` prompts."""
+        return self.render(self.sample(size, rng))
@@ -0,0 +1,262 @@
+import argparse
+import cProfile
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from types import ModuleType
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from fake_ollama_server import start_server
+from generators import GENERATOR_SCRIPTS, load_generator
+from response_rules import ResponseRules
+from sinks import EXTENSIONS
+from stage_timer import StageTimer
+
+# Where the suite saves its results unless told otherwise
+RESULTS_FILE = "benchmark-results.json"
+
+# Vocabularies and the rule table are read from the repository, wherever the benchmark is run from
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def time_rows(produce: Callable[[int], None], num_rows: int) -> float:
+    """Returns the rows per second achieved by ``produce(num_rows)``."""
+    start = time.perf_counter()
+    produce(num_rows)
+    return num_rows / (time.perf_counter() - start)
+
+def benchmark_batch_engine(generator: ModuleType, sizes: List[int], scalar_max: int, chunk_size: int) -> None:
+    """Compares the per-row generate_prompt loop with the batch engine at each size."""
+    rng = np.random.default_rng()
+
+    def scalar(num_rows: int) -> None:
+        for _ in range(num_rows):
+            generator.generate_prompt()
+
+    def batch(num_rows: int) -> None:
+        for start in range(0, num_rows, chunk_size):
+            generator.BATCH_ENGINE.generate(min(chunk_size, num_rows - start), rng)
+
+    for size in sizes:
+        # The per-row loop is too slow to run in full at tens of millions of rows,
+        # so its rate is measured on a capped sample and reported as such.
+        scalar_rows = min(size, scalar_max)
+        scalar_rate = time_rows(scalar, scalar_rows)
+        batch_rate = time_rows(batch, size)
+        sampled = "" if scalar_rows == size else f" (measured on {scalar_rows:,} rows)"
+        print(f"{size:>12,} rows | generate_prompt: {scalar_rate:>12,.0f} rows/s{sampled} | "
+              f"batch engine: {batch_rate:>12,.0f} rows/s | speedup: {batch_rate / scalar_rate:.1f}x")
+
+def synthetic_rules(num_rules: int) -> List[Dict]:
+    """Builds a rule table of ``num_rules`` rules from the challenge, goal and technique vocabularies."""
+    phrases = []
+    for file_path in ["challenges.json", "goals.json", "techniques.json"]:
+        with open(os.path.join(DATA_DIR, file_path), "r") as f:
+            phrases.extend(json.load(f))
+    with open(os.path.join(DATA_DIR, "response-rules.json"), "r") as f:
+        rules = json.load(f)["rules"][:num_rules]
+    # Past the real vocabulary, pad with variants that behave like extra (rarely matching) phrases
+    for i in range(num_rules - len(rules)):
+        phrase = phrases[i % len(phrases)]
+        if i >= len(phrases):
+            phrase = f"{phrase} variant {i // len(phrases)}"
+        rules.append({"phrases": [phrase], "response": f"Advice on {phrase}."})
+    return rules
+
+def benchmark_response_rules(generator: ModuleType, rule_counts: List[int], num_rows: int) -> None:
+    """Compares per-rule substring scans with the compiled trie and the slot-based path as rules grow."""
+    rng = np.random.default_rng()
+    indices = generator.BATCH_ENGINE.sample(num_rows, rng)
+    prompts = list(generator.BATCH_ENGINE.render(indices))
+    for num_rules in rule_counts:
+        table = synthetic_rules(num_rules)
+        rules = ResponseRules(table, ["Default advice."])
+        rules.compile_slots(generator.BATCH_ENGINE)
+
+        def scan(n: int) -> None:
+            for prompt in prompts[:n]:
+                lowered = prompt.lower()
+                [rule["response"] for rule in table if any(phrase in lowered for phrase in rule["phrases"])]
+
+        scan_rate = time_rows(scan, num_rows)
+        trie_rate = time_rows(lambda n: [rules.respond(prompt) for prompt in prompts[:n]], num_rows)
+        slot_rate = time_rows(lambda n: rules.respond_indices(indices), num_rows)
+        print(f"{num_rules:>6,} rules | substring scan: {scan_rate:>10,.0f} rows/s | "
+              f"trie: {trie_rate:>10,.0f} rows/s | sampled slots: {slot_rate:>10,.0f} rows/s")
+
+def benchmark_enrichment(generator: ModuleType, num_prompts: int, concurrency_levels: List[int], latency: float) -> None:
+    """Measures enrichment throughput against a stand-in Ollama server at each concurrency level."""
+    server, host = start_server(latency=latency)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            output_file = os.path.join(tmp, "enhanced_prompts.csv")
+            for concurrency in concurrency_levels:
+                rate = time_rows(lambda n: generator.generate_prompts_batch(n, output_file, concurrency=concurrency,
+                                                                            host=host), num_prompts)
+                print(f"concurrency {concurrency:>4} | {rate:>10,.1f} prompts/s | "
+                      f"ideal {min(concurrency, num_prompts) / latency:>10,.1f} prompts/s")
+    finally:
+        server.shutdown()
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far, in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+def _run_generator(generator_name: str, num_rows: int, output_format: str, chunk_size: int,
+                   profile_path: Optional[str], trace: bool, host: Optional[str], concurrency: int) -> Dict[str, Any]:
+    """Runs one generator end to end in a fresh worker process and measures it."""
+    generator = load_generator(generator_name)
+    timer = StageTimer()
+    profiler = cProfile.Profile() if profile_path else None
+    if trace:
+        tracemalloc.start()
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        if generator_name == "dynamic":
+            rows = generator.generate_prompts_batch(num_rows, os.path.join(tmp, "enhanced_prompts.csv"),
+                                                    concurrency=concurrency, host=host, seed=0, timer=timer)
+        else:
+            rows = generator.generate_data(num_rows, chunk_size=chunk_size, seed=0, timer=timer,
+                                           data_file=os.path.join(tmp, "data" + EXTENSIONS[output_format]),
+                                           output_format=output_format).total_rows
+        if profiler:
+            profiler.disable()
+        seconds = time.perf_counter() - start
+
+    stages = timer.to_dict()
+    # For the dynamic generator this is the enrichment pipeline (model calls and writing)
+    stages["other"] = max(0.0, seconds - sum(stages.values()))
+    result = {
+        "generator": generator_name,
+        "rows": rows,
+        "format": "csv" if generator_name == "dynamic" else output_format,
+        "seconds": seconds,
+        "rows_per_sec": rows / seconds,
+        "stages": stages,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    if trace:
+        snapshot = tracemalloc.take_snapshot()
+        result["traced_peak_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+        result["retained_allocations"] = [f"{stat.traceback[0]}: {stat.size / 2**20:.1f} MiB"
+                                     for stat in snapshot.statistics("lineno")[:10]]
+        tracemalloc.stop()
+    if profiler:
+        profiler.dump_stats(profile_path)
+        result["profile"] = profile_path
+    return result
+
+def benchmark_suite(generators: List[str], sizes: List[int], num_prompts: int, output_format: str, chunk_size: int,
+                    profile_dir: Optional[str], trace: bool, latency: float, concurrency: int) -> List[Dict[str, Any]]:
+    """Runs each generator end to end at each size, each run in its own process so peak RSS is its own.
+
+    The dynamic generator is run once, for ``num_prompts`` prompts, against a
+    stand-in Ollama server with ``latency`` seconds per request.
+    """
+    server, host = start_server(latency=latency)
+    results = []
+    try:
+        context = multiprocessing.get_context("spawn")
+        for generator_name in generators:
+            for num_rows in ([num_prompts] if generator_name == "dynamic" else sizes):
+                profile_path = None
+                if profile_dir:
+                    os.makedirs(profile_dir, exist_ok=True)
+                    profile_path = os.path.join(profile_dir, f"{generator_name}-{num_rows}.prof")
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    result = pool.submit(_run_generator, generator_name, num_rows, output_format, chunk_size,
+                                         profile_path, trace, host, concurrency).result()
+                stages = " ".join(f"{name} {seconds:.2f}s" for name, seconds in result["stages"].items())
+                print(f"{generator_name:>12} | {result['rows']:>12,} rows | {result['rows_per_sec']:>12,.0f} rows/s | "
+                      f"peak RSS {result['peak_rss_mb']:>8,.0f} MiB | {stages}")
+                results.append(result)
+    finally:
+        server.shutdown()
+    return results
+
+def save_results(results: List[Dict[str, Any]], path: str) -> None:
+    """Saves suite results with enough context to tell whether two files are comparable."""
+    with open(path, "w") as f:
+        json.dump({
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "results": results,
+        }, f, indent=2)
+
+def compare_results(results: List[Dict[str, Any]], baseline_path: str, tolerance: float) -> bool:
+    """Prints the throughput change against a saved results file; returns False if any run got slower by more than ``tolerance``."""
+    with open(baseline_path, "r") as f:
+        baseline = {(r["generator"], r["rows"], r["format"]): r for r in json.load(f)["results"]}
+    passed = True
+    for result in results:
+        before = baseline.get((result["generator"], result["rows"], result["format"]))
+        if before is None:
+            continue
+        change = result["rows_per_sec"] / before["rows_per_sec"] - 1
+        regressed = change < -tolerance
+        passed &= not regressed
+        print(f"{result['generator']:>12} | {result['rows']:>12,} rows | {change:>+8.1%} rows/s | "
+              f"peak RSS {before['peak_rss_mb']:,.0f} -> {result['peak_rss_mb']:,.0f} MiB"
+              f"{' | REGRESSION' if regressed else ''}")
+    return passed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the farming prompt generators.")
+    parser.add_argument("--generator", choices=sorted(GENERATOR_SCRIPTS), default="advanced")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--scalar-max", type=int, default=1_000_000,
+                        help="Largest row count the per-row loop is run for")
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64],
+                        help="Concurrency levels for the dynamic generator's enrichment pipeline")
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake model latency in seconds")
+    parser.add_argument("--prompts", type=int, default=256, help="Prompts enhanced per concurrency level")
+    parser.add_argument("--rules", type=int, nargs="+",
+                        help="Benchmark fake-response rule matching at these rule counts instead, e.g. 5 50 500 5000")
+    parser.add_argument("--suite", action="store_true",
+                        help="Run every generator end to end at each --rows count and save the results")
+    parser.add_argument("--format", choices=sorted(EXTENSIONS), default="csv", help="Output format for --suite")
+    parser.add_argument("--results", default=RESULTS_FILE, help="Where --suite saves its results")
+    parser.add_argument("--compare", metavar="BASELINE", help="Results file to compare --suite throughput against")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Slowdown against the baseline reported as a regression, as a fraction")
+    parser.add_argument("--profile", metavar="DIR", help="Save a cProfile dump of each --suite run in DIR")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="Record traced peak memory, and the allocation sites still holding memory, in each --suite run")
+    args = parser.parse_args()
+
+    if args.suite:
+        results = benchmark_suite(sorted(GENERATOR_SCRIPTS), args.rows, args.prompts, args.format, args.chunk_size,
+                                  args.profile, args.tracemalloc, args.latency, max(args.concurrency))
+        save_results(results, args.results)
+        print(f"Results saved to {args.results}")
+        if args.compare and not compare_results(results, args.compare, args.tolerance):
+            sys.exit(1)
+        return
+
+    generator = load_generator(args.generator)
+    if args.rules:
+        benchmark_response_rules(generator, args.rules, min(args.rows))
+    elif args.generator == "dynamic":
+        benchmark_enrichment(generator, args.prompts, args.concurrency, args.latency)
+    else:
+        benchmark_batch_engine(generator, args.rows, args.scalar_max, args.chunk_size)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import json
+import os
+import tempfile
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+# A job's checkpoint lives next to its output file, named after it
+CHECKPOINT_SUFFIX = ".checkpoint.json"
+
+def checkpoint_path(output_file: str) -> str:
+    """Returns where the checkpoint of a job writing ``output_file`` is kept."""
+    return output_file + CHECKPOINT_SUFFIX
+
+def _split(state: Any, prefix: str, arrays: Dict[str, np.ndarray]) -> Any:
+    """Moves numpy arrays out of a nested state into ``arrays``, leaving a reference in their place."""
+    if isinstance(state, np.ndarray):
+        arrays[prefix] = state
+        return {"__array__": prefix}
+    if isinstance(state, dict):
+        return {key: _split(value, f"{prefix}/{key}", arrays) for key, value in state.items()}
+    return state
+
+def _join(state: Any, arrays: Dict[str, np.ndarray]) -> Any:
+    if isinstance(state, dict):
+        if "__array__" in state:
+            return arrays[state["__array__"]]
+        return {key: _join(value, arrays) for key, value in state.items()}
+    return state
+
+def _replace(path: str, write: Callable[[Any], None], mode: str) -> None:
+    """Writes a file through a temporary one and renames it into place, so readers never see half of it."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    with os.fdopen(fd, mode) as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class Checkpoint:
+    """The saved progress of one job, so an interrupted run can continue exactly where it stopped.
+
+    ``params`` are the arguments that decide which rows the job produces.
+    Loading a checkpoint written with different ones is refused, except that
+    params given as None take the saved value. The state is kept as JSON;
+    numpy arrays in it (Bloom filter bits, shuffled decks, counts) go to a
+    ``.npz`` file alongside, which is written before the JSON that refers to
+    it, so a crash mid-save leaves the previous checkpoint intact.
+    """
+
+    def __init__(self, path: str, params: Dict[str, Any]):
+        self.path = path
+        # A JSON round trip, so tuples compare equal to the lists they are saved as
+        self.params = json.loads(json.dumps(params))
+        self._sequence = 0
+        self._arrays_file: Optional[str] = None
+
+    def load(self) -> Optional[Tuple[Dict[str, Any], bool]]:
+        """Returns the saved state and whether the job had finished, or None when there is no checkpoint."""
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        mismatched = [name for name, value in self.params.items()
+                      if value is not None and saved["params"].get(name) != value]
+        if mismatched:
+            raise ValueError(f"{self.path} belongs to a run with a different {', '.join(mismatched)}; "
+                             f"remove it to start over")
+        self.params = saved["params"]
+        self._sequence = saved["sequence"]
+        self._arrays_file = saved["arrays"]
+        arrays = {}
+        if self._arrays_file:
+            with np.load(os.path.join(os.path.dirname(self.path), self._arrays_file)) as data:
+                arrays = {name: data[name] for name in data.files}
+        return _join(saved["state"], arrays), saved["complete"]
+
+    def settle(self, name: str, choose: Callable[[], Any]) -> Any:
+        """Returns a param, choosing it now if it was left as None so a resumed run makes the same choice."""
+        if self.params.get(name) is None:
+            self.params[name] = choose()
+        return self.params[name]
+
+    def save(self, state: Dict[str, Any], complete: bool = False) -> None:
+        """Replaces the checkpoint with ``state``."""
+        self._sequence += 1
+        arrays: Dict[str, np.ndarray] = {}
+        state = _split(state, "", arrays)
+        previous_arrays = self._arrays_file
+        self._arrays_file = None
+        if arrays:
+            self._arrays_file = f"{os.path.basename(self.path)}.{self._sequence}.npz"
+            _replace(os.path.join(os.path.dirname(self.path), self._arrays_file),
+                     lambda f: np.savez(f, **arrays), "wb")
+        saved = {"params": self.params, "complete": complete, "sequence": self._sequence,
+                 "arrays": self._arrays_file, "state": state}
+        _replace(self.path, lambda f: json.dump(saved, f, indent=1), "w")
+        if previous_arrays and previous_arrays != self._arrays_file:
+            os.remove(os.path.join(os.path.dirname(self.path), previous_arrays))
+
+    def remove(self) -> None:
+        """Deletes the checkpoint and its arrays, if any."""
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                arrays_file = json.load(f)["arrays"]
+            if arrays_file:
+                os.remove(os.path.join(os.path.dirname(self.path), arrays_file))
+            os.remove(self.path)
@@ -0,0 +1,286 @@
+import logging
+import math
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from batch_engine import BatchEngine
+
+MASK64 = (1 << 64) - 1
+
+# Sampling modes understood by CoverageSampler
+SAMPLING_MODES = ("random", "stratified", "permutation", "exhaustive")
+
+def _mix(x):
+    """splitmix64 finaliser; works on uint64 arrays (wrapping) and on object arrays of Python ints."""
+    x = (x ^ (x >> 30)) * 0xBF58476D1CE4E5B9 & MASK64
+    x = (x ^ (x >> 27)) * 0x94D049BB133111EB & MASK64
+    return x ^ (x >> 31)
+
+class Permutation:
+    """A keyed pseudo-random bijection on range(n): a balanced Feistel network with cycle walking.
+
+    Spaces below 2**62 are permuted with uint64 arithmetic; larger ones fall
+    back to object arrays of Python ints.
+    """
+
+    def __init__(self, n: int, seed: Union[int, Sequence[int]]):
+        self.n = n
+        bits = max(2, (n - 1).bit_length())
+        bits += bits % 2
+        self.half = bits // 2
+        self.half_mask = (1 << self.half) - 1
+        self.keys = [int(key) for key in np.random.SeedSequence(seed).generate_state(4, dtype=np.uint64)]
+        self.dtype = np.uint64 if bits <= 62 else object
+
+    def _feistel(self, x: np.ndarray) -> np.ndarray:
+        left, right = x >> self.half, x & self.half_mask
+        for key in self.keys:
+            left, right = right, left ^ (_mix(right ^ key) & self.half_mask)
+        return (left << self.half) | right
+
+    def __call__(self, positions: np.ndarray) -> np.ndarray:
+        codes = self._feistel(positions)
+        # Values that land outside range(n) are walked along their cycle until they come back in
+        outside = codes >= self.n
+        while outside.any():
+            codes[outside] = self._feistel(codes[outside])
+            outside = codes >= self.n
+        return codes
+
+class SeenSet:
+    """A Bloom filter over row signatures, used to drop rows that were already generated.
+
+    A signature covers the template and every slot index except those in
+    ``ignore``, with each ``symmetric`` pair ordered so swapping the two values
+    (e.g. crop1 and crop2) gives the same signature. Ignoring minor slots such
+    as farm_size turns exact-duplicate suppression into near-duplicate
+    suppression. False positives drop about ``error_rate`` of new rows; nothing
+    already seen is ever let through.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001, ignore: Iterable[str] = (),
+                 symmetric: Iterable[Tuple[str, str]] = ()):
+        self.num_bits = max(64, int(-max(capacity, 1) * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / max(capacity, 1) * math.log(2)))
+        self.bits = np.zeros((self.num_bits + 7) // 8, dtype=np.uint8)
+        self.ignore = set(ignore)
+        self.symmetric = [tuple(pair) for pair in symmetric]
+
+    def signatures(self, indices: Dict[str, np.ndarray]) -> np.ndarray:
+        """Hashes each row's template and slot indices into a 64-bit signature."""
+        columns = {name: idx for name, idx in indices.items() if name not in self.ignore}
+        for first, second in self.symmetric:
+            if first in columns and second in columns:
+                columns[first], columns[second] = (np.minimum(columns[first], columns[second]),
+                                                   np.maximum(columns[first], columns[second]))
+        signature = np.zeros(len(indices["template"]), dtype=np.uint64)
+        for name in sorted(columns):
+            # +2 keeps the -1 of an unused slot distinct from every real index
+            signature = _mix(signature ^ (columns[name] + 2).astype(np.uint64))
+        return signature
+
+    def _bit_positions(self, signatures: np.ndarray) -> List[np.ndarray]:
+        step = _mix(signatures ^ 0x9E3779B97F4A7C15) | 1
+        return [(signatures + i * step) % self.num_bits for i in range(self.num_hashes)]
+
+    def new_rows(self, signatures: np.ndarray) -> np.ndarray:
+        """Returns a mask of rows not seen before, counting only the first of any repeats within the batch."""
+        unique, first = np.unique(signatures, return_index=True)
+        present = np.ones(len(unique), dtype=bool)
+        for pos in self._bit_positions(unique):
+            present &= ((self.bits[pos >> 3] >> (pos & 7).astype(np.uint8)) & 1).astype(bool)
+        is_new = np.zeros(len(signatures), dtype=bool)
+        is_new[first[~present]] = True
+        return is_new
+
+    def add(self, signatures: np.ndarray) -> None:
+        """Records the signatures as seen."""
+        for pos in self._bit_positions(signatures):
+            np.bitwise_or.at(self.bits, pos >> 3, np.left_shift(1, pos & 7).astype(np.uint8))
+
+class _Deck:
+    """Deals indices from successive shuffled copies of range(n), so every value comes up equally often."""
+
+    def __init__(self, n: int, rng: np.random.Generator):
+        self.n = n
+        self.rng = rng
+        self.cards = np.empty(0, dtype=np.int64)
+
+    def deal(self, count: int) -> np.ndarray:
+        while len(self.cards) < count:
+            self.cards = np.concatenate([self.cards, self.rng.permutation(self.n)])
+        dealt, self.cards = self.cards[:count], self.cards[count:]
+        return dealt
+
+class CoverageSampler:
+    """Chooses template and slot indices for each chunk with a coverage strategy.
+
+    Modes:
+
+    - ``random``: independent uniform draws, exactly like ``BatchEngine.sample``.
+    - ``stratified``: templates, and each slot named in ``stratify``, are dealt
+      from shuffled decks so their counts stay balanced at any N.
+    - ``permutation``: walks the whole combination space (every template with
+      every combination of the slots it uses) in a keyed pseudo-random order,
+      i.e. sampling without replacement.
+    - ``exhaustive``: walks the same space in mixed-radix order.
+
+    The last two give every template an equal share of rows until its
+    combinations run out, and decode position ``start + stride * k`` for the
+    k-th row, so shards using the same ``space_seed`` with different starts
+    never overlap. They stop early once the space is used up. ``seen`` drops
+    repeated rows and ``distinct`` drops rows where both slots of a pair hold
+    the same value.
+    """
+
+    def __init__(self, engine: BatchEngine, mode: str = "random", rng: Optional[np.random.Generator] = None,
+                 space_seed: Optional[int] = None, start: int = 0, stride: int = 1, stratify: Sequence[str] = (),
+                 seen: Optional[SeenSet] = None, distinct: Sequence[Tuple[str, str]] = ()):
+        if mode not in SAMPLING_MODES:
+            raise ValueError(f"Unknown sampling mode '{mode}', expected one of {', '.join(SAMPLING_MODES)}")
+        self.engine = engine
+        self.mode = mode
+        self.rng = rng or np.random.default_rng()
+        self.start = start
+        self.stride = stride
+        self.seen = seen
+        self.distinct = [tuple(pair) for pair in distinct]
+        self.drawn = 0
+        self.exhausted = False
+
+        self._sizes = [math.prod(len(engine.values[slot]) for slot in template.required)
+                       for template in engine.templates]
+        if mode == "stratified":
+            self._template_deck = _Deck(len(engine.templates), self.rng)
+            self._slot_decks = {name: _Deck(len(engine.values[name]), self.rng) for name in stratify}
+        if mode in ("permutation", "exhaustive"):
+            if space_seed is None:
+                space_seed = np.random.SeedSequence().entropy
+            self._permutations = [Permutation(size, [space_seed, t]) for t, size in enumerate(self._sizes)]
+            self._position_dtype = np.uint64 if (max(self._sizes) * len(self._sizes)).bit_length() <= 62 else object
+
+    def _stratified(self, size: int) -> Dict[str, np.ndarray]:
+        template_idx = self._template_deck.deal(size)
+        indices = {"template": template_idx}
+        for name, values in self.engine.values.items():
+            used = self.engine.uses[name][template_idx]
+            slot_idx = np.full(size, -1, dtype=np.int64)
+            deck = self._slot_decks.get(name)
+            count = int(used.sum())
+            slot_idx[used] = deck.deal(count) if deck else self.rng.integers(0, len(values), count)
+            indices[name] = slot_idx
+        return indices
+
+    def _enumerated(self, size: int) -> Dict[str, np.ndarray]:
+        """Decodes the next ``size`` positions of the enumeration, skipping those of used-up templates.
+
+        Position p falls in block p // T (T templates) and every block holds one
+        combination of each template, rotated by a hash of the block number so
+        that any stride still reaches every template. Within template t, block
+        b stands for its b-th combination: the b-th in mixed-radix order, or
+        the b-th of a keyed permutation of them.
+        """
+        num_templates = len(self._sizes)
+        first = self.start + self.stride * self.drawn
+        self.drawn += size
+        if self._position_dtype is object:
+            positions = np.asarray(list(range(first, first + self.stride * size, self.stride)), dtype=object)
+        else:
+            positions = np.arange(first, first + self.stride * size, self.stride, dtype=np.uint64)
+        block = positions // num_templates
+        template_idx = ((positions % num_templates + _mix(block) % num_templates) % num_templates).astype(np.int64)
+        if block[-1] >= max(self._sizes):
+            self.exhausted = True
+
+        valid = np.zeros(size, dtype=bool)
+        indices = {"template": template_idx}
+        for name in self.engine.values:
+            indices[name] = np.full(size, -1, dtype=np.int64)
+        for t, template in enumerate(self.engine.templates):
+            rows = np.flatnonzero((template_idx == t) & (block < self._sizes[t]))
+            if not rows.size:
+                continue
+            valid[rows] = True
+            permutation = self._permutations[t]
+            local = block[rows].astype(permutation.dtype)
+            if self.mode == "permutation":
+                local = permutation(local)
+            # The last slot of a template varies fastest
+            for slot in reversed(template.required):
+                n = len(self.engine.values[slot])
+                indices[slot][rows] = (local % n).astype(np.int64)
+                local = local // n
+        return {name: idx[valid] for name, idx in indices.items()}
+
+    def _draw(self, size: int) -> Dict[str, np.ndarray]:
+        if self.mode == "random":
+            return self.engine.sample(size, self.rng)
+        if self.mode == "stratified":
+            return self._stratified(size)
+        return self._enumerated(size)
+
+    def _keep(self, indices: Dict[str, np.ndarray]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Returns which rows pass the filters, and every row's signature when duplicates are tracked."""
+        keep = np.ones(len(indices["template"]), dtype=bool)
+        for first, second in self.distinct:
+            keep &= (indices[first] < 0) | (indices[first] != indices[second])
+        if self.seen is None:
+            return keep, None
+        signatures = self.seen.signatures(indices)
+        keep[keep] = self.seen.new_rows(signatures[keep])
+        return keep, signatures
+
+    def state(self) -> Dict[str, Any]:
+        """Returns what ``restore`` needs to carry on from here; the random generator is saved by its owner."""
+        state: Dict[str, Any] = {"drawn": self.drawn, "exhausted": self.exhausted}
+        if self.mode == "stratified":
+            state["template_deck"] = self._template_deck.cards
+            state["slot_decks"] = {name: deck.cards for name, deck in self._slot_decks.items()}
+        if self.seen is not None:
+            state["seen"] = self.seen.bits
+        return state
+
+    def restore(self, state: Dict[str, Any]) -> None:
+        """Continues from a ``state()`` taken on a sampler built with the same arguments."""
+        self.drawn = state["drawn"]
+        self.exhausted = state["exhausted"]
+        if self.mode == "stratified":
+            self._template_deck.cards = np.asarray(state["template_deck"], dtype=np.int64)
+            for name, cards in state["slot_decks"].items():
+                self._slot_decks[name].cards = np.asarray(cards, dtype=np.int64)
+        if self.seen is not None:
+            self.seen.bits = np.array(state["seen"], dtype=np.uint8)
+
+    def sample(self, size: int, max_empty_draws: int = 20) -> Dict[str, np.ndarray]:
+        """Returns indices for up to ``size`` rows; fewer once the space (or its unseen part) runs out."""
+        enumerated = self.mode in ("permutation", "exhaustive")
+        if self.mode == "random" and self.seen is None and not self.distinct:
+            return self._draw(size)
+
+        parts: List[Dict[str, np.ndarray]] = []
+        collected = 0
+        empty_draws = 0
+        while collected < size and not self.exhausted:
+            want = size - collected
+            # Enumerated modes draw exactly what is missing, so no position is skipped unused
+            draw = self._draw(want if enumerated else int(want * 1.25) + 16)
+            keep, signatures = self._keep(draw)
+            kept = np.flatnonzero(keep)[:want]
+            if signatures is not None:
+                # Only rows actually handed out count as seen
+                self.seen.add(signatures[kept])
+            if not kept.size:
+                empty_draws += 1
+                # Enumerated modes end by themselves; random draws need a cut-off
+                if not enumerated and empty_draws >= max_empty_draws:
+                    logging.warning(f"Stopping after {max_empty_draws} draws without a new row; "
+                                    f"the unseen part of the space is nearly used up")
+                    self.exhausted = True
+                continue
+            empty_draws = 0
+            parts.append({name: idx[kept] for name, idx in draw.items()})
+            collected += kept.size
+        if not parts:
+            return {name: np.empty(0, dtype=np.int64) for name in ["template", *self.engine.values]}
+        return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
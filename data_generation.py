@@ -0,0 +1,200 @@
+import logging
+import random
+import time
+import numpy as np
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from datetime import datetime, timedelta
+
+from batch_engine import BatchEngine
+from checkpoint import Checkpoint
+from coverage_sampler import CoverageSampler, SeenSet
+from progress import Progress
+from response_rules import ResponseRules
+from sharding import generate_sharded
+from sinks import infer_format, open_sink
+from slot_stats import SlotStats
+from stage_timer import StageTimer
+
+# Path to the CSV file for storing prompts and responses
+DATA_FILE = "prompts_and_responses.csv"
+
+# Number of rows sampled, rendered and written together
+CHUNK_SIZE = 100_000
+
+# With DEBUG logging enabled, one row in every LOG_EVERY is logged as a sample of the output
+LOG_EVERY = 1000
+
+class PromptGenerator:
+    """Generates prompt and fake response rows from one script's templates, slot values and rules.
+
+    The generator scripts only hold data; this class runs the chunked,
+    checkpointed generation loop for them. ``co_occurrence_pairs`` are the
+    slot pairs counted in the statistics, ``near_duplicate_slots`` and
+    ``symmetric_slots`` define near duplicates for dedupe, and
+    ``stratify_slots`` are kept balanced by stratified sampling.
+    """
+
+    def __init__(self, name: str, engine: BatchEngine, rules: ResponseRules, slot_values: Dict[str, List[str]],
+                 co_occurrence_pairs: Sequence[Tuple[str, str]] = (), near_duplicate_slots: Sequence[str] = (),
+                 symmetric_slots: Sequence[Tuple[str, str]] = (), stratify_slots: Sequence[str] = (),
+                 data_file: str = DATA_FILE, chunk_size: int = CHUNK_SIZE):
+        self.name = name
+        self.engine = engine
+        self.rules = rules
+        self.slot_values = slot_values
+        self.co_occurrence_pairs = list(co_occurrence_pairs)
+        self.near_duplicate_slots = list(near_duplicate_slots)
+        self.symmetric_slots = list(symmetric_slots)
+        self.stratify_slots = list(stratify_slots)
+        self.data_file = data_file
+        self.chunk_size = chunk_size
+
+    def new_stats(self) -> SlotStats:
+        """Returns an empty statistics accumulator for this generator's templates and slots."""
+        return SlotStats(self.engine.template_slots, self.slot_values, self.co_occurrence_pairs)
+
+    def generate_prompt(self) -> str:
+        """Generates a single, dynamic prompt using the templates and entities."""
+        template = random.choice(self.engine.templates)
+        return template.render({slot: random.choice(self.slot_values[slot]) for slot in template.required})
+
+    def generate_fake_response(self, prompt: str) -> str:
+        """Generates a fake response based on keywords in the prompt."""
+        return self.rules.respond(prompt)
+
+    def generate_data(self, num_prompts: int, chunk_size: Optional[int] = None, data_file: Optional[str] = None,
+                      seed: Optional[int] = None, reference_date: Optional[datetime] = None,
+                      output_format: Optional[str] = None, sampling: str = "random", dedupe: bool = False,
+                      shard: Tuple[int, int] = (0, 1), space_seed: Optional[int] = None,
+                      timer: Optional[StageTimer] = None, log_every: int = LOG_EVERY,
+                      checkpoint_file: Optional[str] = None, checkpoint_interval: float = 60.0,
+                      progress_interval: Optional[float] = 10.0,
+                      report_rows: Optional[Callable[[int], None]] = None) -> SlotStats:
+        """Generates synthetic data by creating prompts and fake responses in chunks.
+
+        The output format (csv, jsonl or parquet) is inferred from ``data_file``
+        unless given. ``sampling`` picks a CoverageSampler mode, and ``dedupe``
+        drops exact and near-duplicate rows and identical symmetric slots. For
+        the enumerated modes, ``shard`` (index, count) and ``space_seed`` keep
+        shards of one run disjoint. The same arguments always produce the same
+        rows. Time spent per stage (sample, stats, render, respond, serialize,
+        write) is added to ``timer`` when given, and a progress line is logged
+        every ``progress_interval`` seconds unless it is None. ``report_rows``,
+        when given, is called with the number of rows done after every chunk.
+
+        With ``checkpoint_file``, the generator state is saved there every
+        ``checkpoint_interval`` seconds and when the run ends. If the file already
+        exists, the run continues from it and the output ends up identical to an
+        uninterrupted run (gzipped output once decompressed); a seed or
+        reference date left as None is taken from it. Parquet output is only
+        checkpointed once complete, so an interrupted Parquet run starts over.
+        Returns the slot statistics collected along the way; there may be fewer
+        than ``num_prompts`` rows if the sampler runs out of distinct ones.
+        """
+        chunk_size = chunk_size or self.chunk_size
+        data_file = data_file or self.data_file
+        stats = self.new_stats()
+        timer = timer or StageTimer()
+        output_format = output_format or infer_format(data_file)
+        checkpoint, saved = None, None
+        if checkpoint_file:
+            checkpoint = Checkpoint(checkpoint_file, {
+                "num_prompts": num_prompts, "chunk_size": chunk_size, "seed": seed,
+                "reference_date": reference_date.date().isoformat() if reference_date else None,
+                "output_format": output_format, "sampling": sampling, "dedupe": dedupe, "shard": shard,
+                "space_seed": space_seed,
+            })
+            saved = checkpoint.load()
+            seed = checkpoint.settle("seed", lambda: int(np.random.SeedSequence().entropy % 2**63))
+            reference_date = datetime.fromisoformat(checkpoint.settle("reference_date",
+                                                                      lambda: datetime.now().date().isoformat()))
+            if saved and saved[1]:
+                logging.info(f"{data_file} is already complete")
+                return stats.load_dict(saved[0]["stats"])
+
+        rng = np.random.default_rng(seed)
+        seen = None
+        if dedupe:
+            seen = SeenSet(num_prompts, ignore=self.near_duplicate_slots, symmetric=self.symmetric_slots)
+        sampler = CoverageSampler(
+            self.engine, sampling, rng,
+            space_seed=seed if space_seed is None else space_seed, start=shard[0], stride=shard[1],
+            stratify=self.stratify_slots, seen=seen, distinct=self.symmetric_slots if dedupe else (),
+        )
+        resume_offset = None
+        if saved:
+            state = saved[0]
+            rng.bit_generator.state = state["rng"]
+            sampler.restore(state["sampler"])
+            stats.load_dict(state["stats"])
+            resume_offset = state["offset"]
+            logging.info(f"Resuming {data_file} after {stats.total_rows} rows")
+        today = reference_date or datetime.now()
+        dates = np.asarray([(today - timedelta(days=days)).strftime("%Y-%m-%d") for days in range(366)],
+                           dtype=object)
+        template_ids = np.asarray([str(t) for t in range(len(self.engine.templates))], dtype=object)
+        progress = Progress(num_prompts, progress_interval, stats.total_rows) if progress_interval is not None else None
+        last_checkpoint = time.monotonic()
+
+        with open_sink(data_file, output_format, resume_offset) as sink:
+            while stats.total_rows < num_prompts:
+                with timer.stage("sample"):
+                    indices = sampler.sample(min(chunk_size, num_prompts - stats.total_rows))
+                    size = len(indices["template"])
+                    date_idx = rng.integers(0, len(dates), size)
+                if not size:
+                    logging.warning(f"Sampler ran out of distinct rows after {stats.total_rows} of {num_prompts}")
+                    break
+                with timer.stage("stats"):
+                    stats.update(indices)
+                with timer.stage("render"):
+                    prompts = self.engine.render(indices)
+                with timer.stage("respond"):
+                    responses = self.rules.respond_indices(indices)
+
+                categoricals = {"Generation Date": (date_idx, dates), "template_id": (indices["template"], template_ids)}
+                for name, values in self.engine.values.items():
+                    categoricals[name] = (indices[name], values)
+                with timer.stage("serialize"):
+                    payload = sink.encode({"Prompt": prompts, "Response": responses}, categoricals)
+                with timer.stage("write"):
+                    sink.write_encoded(payload)
+
+                if logging.getLogger().isEnabledFor(logging.DEBUG):
+                    for row in range(0, size, log_every):
+                        logging.debug(f"Prompt: {prompts[row]}\nResponse: {responses[row]}\n"
+                                      f"Generation Date: {dates[date_idx[row]]}\n")
+                if progress:
+                    progress.update(stats.total_rows)
+                if report_rows:
+                    report_rows(stats.total_rows)
+                if checkpoint and sink.resumable and time.monotonic() - last_checkpoint >= checkpoint_interval:
+                    with timer.stage("checkpoint"):
+                        checkpoint.save({"offset": sink.checkpoint(), "rng": rng.bit_generator.state,
+                                         "sampler": sampler.state(), "stats": stats.to_dict(as_lists=False)})
+                    last_checkpoint = time.monotonic()
+
+        if checkpoint:
+            checkpoint.save({"stats": stats.to_dict(as_lists=False)}, complete=True)
+        if progress:
+            progress.finish(stats.total_rows)
+        return stats
+
+    def generate_data_parallel(self, num_prompts: int, num_shards: int, output_dir: str,
+                               master_seed: Optional[int] = None, workers: Optional[int] = None,
+                               output_format: str = "csv", sampling: str = "random", dedupe: bool = False,
+                               resume: bool = False, checkpoint_interval: float = 60.0,
+                               progress_interval: Optional[float] = 10.0) -> str:
+        """Generates the dataset as independently reproducible shards in a process pool; returns the manifest path."""
+        return generate_sharded(self.name, num_prompts, num_shards, output_dir, master_seed, workers, self.chunk_size,
+                                output_format, sampling, dedupe, resume, checkpoint_interval, progress_interval)
+
+    def analyze_data(self, stats: SlotStats) -> Dict[str, int]:
+        """Summarises the slot statistics collected while generating the data."""
+        return {
+            "total_prompts": stats.total_rows,
+            "unique_crops": stats.unique("crop1", "crop2"),
+            "unique_locations": stats.unique("location"),
+            "challenges_mentioned": stats.rows_using("challenge"),
+            "techniques_mentioned": stats.rows_using("technique"),
+        }
@@ -1,49 +1,137 @@
+import asyncio
+import logging
 import random
+import sys
+import numpy as np
 import ollama
 
+from batch_engine import BatchEngine
+from checkpoint import Checkpoint
+from coverage_sampler import CoverageSampler
+from enrichment import enrich_prompts
+from generate import main as cli_main
+from progress import Progress
+from prompt_cache import PromptCache
+from stage_timer import StageTimer
+
+# Model used to enhance the base prompts
+MODEL = "llama2"
+
+# Enhanced prompts are reused from here across runs
+CACHE_FILE = "prompt_cache.sqlite"
+
+# Batch runs write the enhanced prompts here unless told otherwise
+DATA_FILE = "enhanced_prompts.csv"
+
+SEASONS = ["spring", "summer", "fall", "winter"]
+CROP_TYPES = ["vegetables", "fruits", "grains", "herbs"]
+FARMING_ACTIVITIES = ["planting", "harvesting", "irrigation", "pest control", "soil management", "crop rotation"]
+CHALLENGES = ["drought", "heavy rainfall", "pest infestation", "market fluctuations", "labor shortage", "equipment failure"]
+FARM_SIZES = ["small family farm", "large commercial farm", "urban garden", "hydroponic setup"]
+FARMING_METHODS = ["organic", "conventional", "permaculture", "vertical farming", "aquaponics"]
+
+BASE_PROMPT_TEMPLATE = "You are a farmer managing a {farm_size} using {method} techniques. It's {season}, and you're focusing on {crop}. You're currently dealing with {activity}, but facing a challenge related to {challenge}. Describe the situation and ask for advice."
+
+# The scenario space (4 x 4 x 6 x 6 x 4 x 5 = 11,520 base prompts), walked by the batch sampler
+BASE_ENGINE = BatchEngine([BASE_PROMPT_TEMPLATE], {
+    "season": SEASONS,
+    "crop": CROP_TYPES,
+    "activity": FARMING_ACTIVITIES,
+    "challenge": CHALLENGES,
+    "farm_size": FARM_SIZES,
+    "method": FARMING_METHODS,
+})
+
 def generate_base_prompt():
-    seasons = ["spring", "summer", "fall", "winter"]
-    crop_types = ["vegetables", "fruits", "grains", "herbs"]
-    farming_activities = ["planting", "harvesting", "irrigation", "pest control", "soil management", "crop rotation"]
-    challenges = ["drought", "heavy rainfall", "pest infestation", "market fluctuations", "labor shortage", "equipment failure"]
-    farm_sizes = ["small family farm", "large commercial farm", "urban garden", "hydroponic setup"]
-    farming_methods = ["organic", "conventional", "permaculture", "vertical farming", "aquaponics"]
+    season = random.choice(SEASONS)
+    crop = random.choice(CROP_TYPES)
+    activity = random.choice(FARMING_ACTIVITIES)
+    challenge = random.choice(CHALLENGES)
+    farm_size = random.choice(FARM_SIZES)
+    method = random.choice(FARMING_METHODS)
 
-    season = random.choice(seasons)
-    crop = random.choice(crop_types)
-    activity = random.choice(farming_activities)
-    challenge = random.choice(challenges)
-    farm_size = random.choice(farm_sizes)
-    method = random.choice(farming_methods)
+    return BASE_PROMPT_TEMPLATE.format(season=season, crop=crop, activity=activity, challenge=challenge,
+                                       farm_size=farm_size, method=method)
 
-    prompt = f"You are a farmer managing a {farm_size} using {method} techniques. It's {season}, and you're focusing on {crop}. You're currently dealing with {activity}, but facing a challenge related to {challenge}. Describe the situation and ask for advice."
+def iter_base_prompts(num_prompts, sampling="permutation", seed=None, chunk_size=1000, timer=None):
+    # Permutation sampling gives every scenario once before any repeats, so no LLM call is spent twice
+    timer = timer or StageTimer()
+    sampler = CoverageSampler(BASE_ENGINE, sampling, np.random.default_rng(seed), space_seed=seed)
+    produced = 0
+    while produced < num_prompts:
+        with timer.stage("sample"):
+            indices = sampler.sample(min(chunk_size, num_prompts - produced))
+        if not len(indices["template"]):
+            logging.warning(f"Only {produced} distinct scenarios are available with {sampling} sampling")
+            return
+        produced += len(indices["template"])
+        with timer.stage("render"):
+            prompts = BASE_ENGINE.render(indices)
+        yield from prompts
 
-    return prompt
+def build_instruction(base_prompt):
+    return f"Based on the following scenario, generate a detailed and engaging farming-related prompt:\n\n{base_prompt}\n\nGenerated prompt:"
 
-def generate_farming_prompt(base_prompt):
+def generate_farming_prompt(base_prompt, cache=None, reuse_cache=True):
+    instruction = build_instruction(base_prompt)
+    if cache is not None and reuse_cache:
+        cached = cache.get(MODEL, instruction)
+        if cached is not None:
+            return cached
     try:
-        response = ollama.generate(model="llama2", prompt=f"Based on the following scenario, generate a detailed and engaging farming-related prompt:\n\n{base_prompt}\n\nGenerated prompt:")
-        return response['response'].strip()
+        response = ollama.generate(model=MODEL, prompt=instruction)
+        enhanced_prompt = response['response'].strip()
+        if cache is not None:
+            cache.put(MODEL, instruction, enhanced_prompt)
+        return enhanced_prompt
     except Exception as e:
         print(f"Error generating prompt with Ollama: {e}")
         return base_prompt
 
-def main():
+def generate_prompts_batch(num_prompts, output_file, model=MODEL, concurrency=8, timeout=120.0, retries=3, host=None,
+                           cache=None, reuse_cache=True, sampling="permutation", seed=None, timer=None,
+                           checkpoint_file=None, checkpoint_interval=60.0, progress_interval=None):
+    checkpoint = None
+    if checkpoint_file:
+        # The seed is fixed up front so a resumed run walks the scenarios in the same order
+        checkpoint = Checkpoint(checkpoint_file, {"num_prompts": num_prompts, "model": model,
+                                                  "sampling": sampling, "seed": seed})
+        checkpoint.load()
+        seed = checkpoint.settle("seed", lambda: int(np.random.SeedSequence().entropy % 2**63))
+    progress = Progress(num_prompts, progress_interval, label="prompts") if progress_interval is not None else None
+    base_prompts = iter_base_prompts(num_prompts, sampling, seed, timer=timer)
+    return asyncio.run(enrich_prompts(base_prompts, build_instruction, output_file, model,
+                                      concurrency=concurrency, timeout=timeout, retries=retries, host=host,
+                                      cache=cache, reuse_cache=reuse_cache, checkpoint=checkpoint,
+                                      checkpoint_interval=checkpoint_interval, progress=progress))
+
+def interactive():
     print("Dynamic Farming Prompts Generator")
     print("=================================")
 
-    while True:
-        base_prompt = generate_base_prompt()
-        enhanced_prompt = generate_farming_prompt(base_prompt)
+    cache = PromptCache(CACHE_FILE)
+    try:
+        while True:
+            base_prompt = generate_base_prompt()
+            enhanced_prompt = generate_farming_prompt(base_prompt, cache)
 
-        print("\nGenerated Prompt:")
-        print(enhanced_prompt)
+            print("\nGenerated Prompt:")
+            print(enhanced_prompt)
 
-        user_input = input("\nPress Enter to generate another prompt, or type 'q' to quit: ")
-        if user_input.lower() == 'q':
-            break
+            user_input = input("\nPress Enter to generate another prompt, or type 'q' to quit: ")
+            if user_input.lower() == 'q':
+                break
+    finally:
+        cache.close()
 
     print("Thank you for using the Dynamic Farming Prompts Generator!")
 
+def main():
+    # With no arguments the generator runs interactively; --batch N (or --rows N) runs the shared command line
+    if len(sys.argv) == 1:
+        interactive()
+        return
+    cli_main(generator_name="dynamic")
+
 if __name__ == "__main__":
     main()
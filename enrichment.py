@@ -0,0 +1,122 @@
+import asyncio
+import csv
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+import numpy as np
+import ollama
+
+from checkpoint import Checkpoint
+from progress import Progress
+from prompt_cache import PromptCache
+
+async def enrich_prompt(client: ollama.AsyncClient, base_prompt: str, instruction: str, model: str,
+                        timeout: float, retries: int, backoff: float, options: Optional[Dict[str, Any]] = None,
+                        cache: Optional[PromptCache] = None, reuse_cache: bool = True) -> str:
+    """Asks the model to enhance one prompt, retrying with exponential backoff and falling back to the base prompt.
+
+    With a cache, a stored response is returned without calling the model unless
+    ``reuse_cache`` is False; fresh responses are stored either way.
+    """
+    if cache is not None and reuse_cache:
+        cached = cache.get(model, instruction, options)
+        if cached is not None:
+            return cached
+    for attempt in range(retries + 1):
+        try:
+            response = await asyncio.wait_for(client.generate(model=model, prompt=instruction, options=options),
+                                              timeout)
+            enhanced_prompt = response['response'].strip()
+            if cache is not None:
+                cache.put(model, instruction, enhanced_prompt, options)
+            return enhanced_prompt
+        except Exception as e:
+            if attempt == retries:
+                logging.warning(f"Error generating prompt with Ollama, keeping base prompt: {e}")
+                return base_prompt
+            await asyncio.sleep(backoff * 2 ** attempt)
+
+async def enrich_prompts(base_prompts: Iterable[str], build_instruction: Callable[[str], str], output_file: str,
+                         model: str, concurrency: int = 8, timeout: float = 120.0, retries: int = 3,
+                         backoff: float = 1.0, host: Optional[str] = None, queue_size: Optional[int] = None,
+                         options: Optional[Dict[str, Any]] = None, cache: Optional[PromptCache] = None,
+                         reuse_cache: bool = True, checkpoint: Optional[Checkpoint] = None,
+                         checkpoint_interval: float = 60.0, progress: Optional[Progress] = None) -> int:
+    """Enhances base prompts with ``concurrency`` requests in flight, writing each result as it completes.
+
+    Base prompts are fed through a bounded queue, so a large or endless input
+    is only read as fast as the model keeps up. Returns the number of rows written.
+
+    With a ``checkpoint``, the output size, the indices finished so far and
+    the cache counters are saved every ``checkpoint_interval`` seconds. A run
+    that finds a checkpoint cuts the output back to it and only enhances the
+    prompts not yet written, so ``base_prompts`` must come out in the same
+    order again; with a cache, rows lost after the checkpoint cost no new
+    model calls.
+    """
+    client = ollama.AsyncClient(host=host)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size or 2 * concurrency)
+    done = set()
+    resuming = False
+    saved = checkpoint.load() if checkpoint is not None else None
+    if saved:
+        state, complete = saved
+        if complete:
+            logging.info(f"{output_file} is already complete")
+            return state["written"]
+        resuming = True
+        done = set(state["done"].tolist())
+        # Rows written after the checkpoint are enhanced again, from the cache if there is one
+        os.truncate(output_file, state["offset"])
+        if cache is not None and state["cache"]:
+            cache.hits, cache.misses = state["cache"]["hits"], state["cache"]["misses"]
+        logging.info(f"Resuming {output_file} after {len(done)} prompts")
+    written = len(done)
+    if progress is not None:
+        progress.first = written
+    last_checkpoint = time.monotonic()
+
+    with open(output_file, "a" if resuming else "w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.writer(csvfile)
+        if not resuming:
+            writer.writerow(["Index", "Base Prompt", "Enhanced Prompt"])
+
+        def save_checkpoint(complete: bool = False) -> None:
+            csvfile.flush()
+            os.fsync(csvfile.fileno())
+            checkpoint.save({"offset": os.path.getsize(output_file), "written": written,
+                             "done": np.fromiter(sorted(done), dtype=np.int64, count=len(done)),
+                             "cache": cache.stats() if cache is not None else None}, complete)
+
+        async def produce() -> None:
+            for index, base_prompt in enumerate(base_prompts):
+                if index not in done:
+                    await queue.put((index, base_prompt))
+            for _ in range(concurrency):
+                await queue.put(None)
+
+        async def consume() -> None:
+            nonlocal written, last_checkpoint
+            while (item := await queue.get()) is not None:
+                index, base_prompt = item
+                enhanced_prompt = await enrich_prompt(client, base_prompt, build_instruction(base_prompt), model,
+                                                      timeout, retries, backoff, options, cache, reuse_cache)
+                writer.writerow([index, base_prompt, enhanced_prompt])
+                csvfile.flush()
+                done.add(index)
+                written += 1
+                if progress is not None:
+                    progress.update(written)
+                if checkpoint is not None and time.monotonic() - last_checkpoint >= checkpoint_interval:
+                    save_checkpoint()
+                    last_checkpoint = time.monotonic()
+
+        await asyncio.gather(produce(), *(consume() for _ in range(concurrency)))
+        if checkpoint is not None:
+            save_checkpoint(complete=True)
+    if progress is not None:
+        progress.finish(written)
+
+    return written
@@ -0,0 +1,158 @@
+import argparse
+import json
+import logging
+import os
+import tempfile
+from typing import Dict, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+# JSON lists longer than this are converted to the memory-mapped binary form on first load
+BINARY_THRESHOLD = 100_000
+
+def dedupe(values: Sequence[str], name: str) -> List[str]:
+    """Validates an entity list and drops repeated entries, keeping first occurrences in order."""
+    if not isinstance(values, list) or not values:
+        raise ValueError(f"Entity list '{name}' must be a non-empty JSON array")
+    bad = [value for value in values if not isinstance(value, str) or not value.strip()]
+    if bad:
+        raise ValueError(f"Entity list '{name}' has {len(bad)} empty or non-string entries, e.g. {bad[0]!r}")
+    unique = list(dict.fromkeys(values))
+    if len(unique) < len(values):
+        logging.debug(f"Dropped {len(values) - len(unique)} duplicate entries from '{name}'")
+    return unique
+
+class MappedEntities:
+    """An entity list stored as a UTF-8 blob plus an offsets array, both memory-mapped.
+
+    Entry i is ``blob[offsets[i]:offsets[i + 1]]``. Nothing is decoded until it
+    is read, and processes mapping the same files share their pages.
+    """
+
+    def __init__(self, offsets_path: str, blob_path: str):
+        self.offsets = np.load(offsets_path, mmap_mode="r")
+        self.blob = np.load(blob_path, mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self.blob[self.offsets[index]:self.offsets[index + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        return (self[i] for i in range(len(self)))
+
+    def take(self, indices: np.ndarray) -> np.ndarray:
+        """Decodes the entries at ``indices`` into an object array."""
+        offsets, blob = self.offsets, self.blob
+        return np.asarray([blob[offsets[i]:offsets[i + 1]].tobytes().decode("utf-8") for i in indices.tolist()],
+                          dtype=object)
+
+def write_binary(values: Sequence[str], offsets_path: str, blob_path: str) -> None:
+    """Writes an entity list in the offsets-plus-blob form, replacing any existing files atomically."""
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    for path, array in [(offsets_path, offsets), (blob_path, blob)]:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".npy")
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, path)
+
+class LazyEntities:
+    """A catalog entry that loads its list the first time it is read."""
+
+    def __init__(self, catalog: "EntityCatalog", name: str):
+        self.catalog = catalog
+        self.name = name
+        self._values: Optional[Union[np.ndarray, MappedEntities]] = None
+
+    @property
+    def values(self) -> Union[np.ndarray, MappedEntities]:
+        if self._values is None:
+            self._values = self.catalog.load(self.name)
+        return self._values
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, index: int) -> str:
+        return self.values[index]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.values)
+
+    def take(self, indices: np.ndarray) -> np.ndarray:
+        return self.values.take(indices)
+
+    def __repr__(self) -> str:
+        return f"LazyEntities({self.name!r})"
+
+class EntityCatalog:
+    """Resolves entity lists by name and loads each one lazily.
+
+    ``catalog["farm_types"]`` and ``catalog["farm-types"]`` both find
+    ``farm-types.json``. Lists are validated and de-duplicated when loaded.
+    Small lists become in-memory arrays. Lists with more than ``binary_threshold``
+    entries are converted once to ``<name>.offsets.npy`` and ``<name>.blob.npy``
+    and memory-mapped from then on.
+    """
+
+    def __init__(self, directory: str, binary_threshold: int = BINARY_THRESHOLD):
+        self.directory = directory
+        self.binary_threshold = binary_threshold
+        self._entries: Dict[str, LazyEntities] = {}
+
+    def __getitem__(self, name: str) -> LazyEntities:
+        stem = name.replace("_", "-")
+        if stem not in self._entries:
+            self._entries[stem] = LazyEntities(self, stem)
+        return self._entries[stem]
+
+    def _path(self, stem: str, suffix: str) -> str:
+        return os.path.join(self.directory, stem + suffix)
+
+    def load(self, stem: str) -> Union[np.ndarray, MappedEntities]:
+        """Loads one list, preferring an up-to-date binary form over the JSON source."""
+        json_path = self._path(stem, ".json")
+        offsets_path, blob_path = self._path(stem, ".offsets.npy"), self._path(stem, ".blob.npy")
+        has_binary = os.path.exists(offsets_path) and os.path.exists(blob_path)
+        if has_binary and (not os.path.exists(json_path)
+                           or os.path.getmtime(offsets_path) >= os.path.getmtime(json_path)):
+            return MappedEntities(offsets_path, blob_path)
+        if not os.path.exists(json_path):
+            raise FileNotFoundError(f"No entity list named '{stem}' in {self.directory}")
+
+        with open(json_path, 'r') as f:
+            values = dedupe(json.load(f), stem)
+        if len(values) > self.binary_threshold:
+            write_binary(values, offsets_path, blob_path)
+            return MappedEntities(offsets_path, blob_path)
+        return np.asarray(values, dtype=object)
+
+    def build(self, stem: str) -> None:
+        """Converts a JSON list to the binary form regardless of its size."""
+        stem = stem.replace("_", "-")
+        with open(self._path(stem, ".json"), 'r') as f:
+            values = dedupe(json.load(f), stem)
+        write_binary(values, self._path(stem, ".offsets.npy"), self._path(stem, ".blob.npy"))
+        logging.info(f"Built {stem} with {len(values)} entries")
+
+def main():
+    parser = argparse.ArgumentParser(description="Build memory-mapped entity lists from JSON sources.")
+    parser.add_argument("names", nargs="+", help="Entity list names, e.g. locations crops")
+    parser.add_argument("--directory", default=os.path.dirname(os.path.abspath(__file__)))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    catalog = EntityCatalog(args.directory)
+    for name in args.names:
+        catalog.build(name)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """Answers POST /api/generate like Ollama does with ``stream: false``, after a fake delay."""
+
+    # Set on the server instance by start_server
+    server: "FakeOllamaServer"
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self.send_error(404)
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        time.sleep(self.server.latency)
+        if random.random() < self.server.failure_rate:
+            self.send_error(500, "Simulated model failure")
+            return
+
+        body = json.dumps({
+            "model": request.get("model", ""),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "response": f"Enhanced: {request.get('prompt', '')[-200:]}",
+            "done": True,
+            "done_reason": "stop",
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address: Tuple[str, int], latency: float, failure_rate: float):
+        super().__init__(address, FakeOllamaHandler)
+        self.latency = latency
+        self.failure_rate = failure_rate
+
+def start_server(port: int = 0, latency: float = 0.5, failure_rate: float = 0.0) -> Tuple[FakeOllamaServer, str]:
+    """Starts a stand-in Ollama server on a background thread; returns it with its host URL."""
+    server = FakeOllamaServer(("127.0.0.1", port), latency, failure_rate)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in for the Ollama /api/generate endpoint.")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds to wait before each response")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 500")
+    args = parser.parse_args()
+
+    server, host = start_server(args.port, args.latency, args.failure_rate)
+    print(f"Fake Ollama server listening on {host}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
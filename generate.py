@@ -0,0 +1,189 @@
+import argparse
+import json
+import logging
+import os
+from types import ModuleType
+from typing import List, Optional
+
+from checkpoint import Checkpoint, checkpoint_path
+from coverage_sampler import SAMPLING_MODES
+from generators import GENERATOR_SCRIPTS, load_generator
+from prompt_cache import PromptCache
+from sharding import MANIFEST_FILE, generate_sharded, regenerate_shard
+from sinks import EXTENSIONS, infer_format
+
+def positive_int(value: str) -> int:
+    """Parses a count that must be at least one."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, not {value}")
+    return number
+
+def non_negative_int(value: str) -> int:
+    """Parses a count that may be zero."""
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"must not be negative, not {value}")
+    return number
+
+def positive_float(value: str) -> float:
+    """Parses a duration that must be above zero."""
+    number = float(value)
+    if not number > 0:
+        raise argparse.ArgumentTypeError(f"must be positive, not {value}")
+    return number
+
+def build_parser(generator_name: Optional[str] = None) -> argparse.ArgumentParser:
+    """Builds the command line shared by all generators; ``generator_name`` fixes the generator instead of asking."""
+    parser = argparse.ArgumentParser(description="Generate farming prompts as a resumable, checkpointed job.")
+    if generator_name is None:
+        parser.add_argument("generator", choices=sorted(GENERATOR_SCRIPTS))
+    parser.add_argument("--rows", "--batch", type=positive_int, default=1000, help="Rows (or prompts to enhance) to generate")
+    parser.add_argument("--output", help="Output file, or directory with --shards; defaults to the generator's own")
+    parser.add_argument("--format", choices=sorted(EXTENSIONS), help="Output format; inferred from --output if not given")
+    parser.add_argument("--seed", type=int, help="Makes the run reproducible; chosen at random and recorded if not given")
+    parser.add_argument("--sampling", choices=SAMPLING_MODES,
+                        help="How rows are chosen (default: random, or permutation for the dynamic generator)")
+    parser.add_argument("--dedupe", action="store_true", help="Drop exact and near-duplicate rows")
+    parser.add_argument("--chunk-size", type=positive_int, default=100_000)
+    parser.add_argument("--shards", type=positive_int, default=1, help="Write this many shards into the --output directory")
+    parser.add_argument("--workers", type=positive_int, help="Processes used for --shards")
+    parser.add_argument("--regenerate-shard", type=non_negative_int, metavar="INDEX",
+                        help="Rebuild one shard of the sharded run in the --output directory from its manifest")
+    parser.add_argument("--resume", action="store_true", help="Continue the interrupted job writing to --output")
+    parser.add_argument("--overwrite", action="store_true", help="Discard an interrupted job's checkpoint and start over")
+    parser.add_argument("--checkpoint-interval", type=float, default=60.0, help="Seconds between checkpoints")
+    parser.add_argument("--progress-interval", type=float, default=10.0, help="Seconds between progress lines")
+
+    dynamic = parser.add_argument_group("dynamic generator")
+    dynamic.add_argument("--model", help="Ollama model used to enhance prompts")
+    dynamic.add_argument("--concurrency", type=positive_int, default=8)
+    dynamic.add_argument("--timeout", type=positive_float, default=120.0)
+    dynamic.add_argument("--retries", type=non_negative_int, default=3, help="Retries after a failed request")
+    dynamic.add_argument("--host", help="Ollama server URL, e.g. http://localhost:11434")
+    dynamic.add_argument("--cache", help="Cache of enhanced prompts shared across runs")
+    dynamic.add_argument("--cache-size", type=positive_int, default=100_000, help="Most entries kept in the cache")
+    dynamic.add_argument("--fresh", action="store_true", help="Sample fresh responses instead of reusing cached ones")
+    return parser
+
+def default_output(generator_name: str, generator: ModuleType, output_format: Optional[str], sharded: bool) -> str:
+    """Returns the generator's own output file with the extension of ``output_format``, or a directory for shards."""
+    if sharded:
+        return f"{generator_name}-shards"
+    stem = generator.DATA_FILE.rsplit(".", 1)[0]
+    return stem + EXTENSIONS[output_format or infer_format(generator.DATA_FILE)]
+
+def check_previous_run(parser: argparse.ArgumentParser, path: str, resume: bool, overwrite: bool) -> bool:
+    """Returns whether the earlier run recorded at ``path`` (a checkpoint or manifest) is to be replaced.
+
+    A finished run is replaced as the scripts always did, but an interrupted
+    one only with --overwrite, so hours of output are never dropped by accident.
+    """
+    if not os.path.exists(path):
+        if resume:
+            parser.error(f"nothing to resume: {path} does not exist")
+        return False
+    if resume:
+        return False
+    with open(path, "r", encoding="utf-8") as f:
+        saved = json.load(f)
+    # Checkpoints say whether they are complete; a manifest gets its stats once every shard is done
+    if not saved.get("complete", "stats" in saved) and not overwrite:
+        parser.error(f"{path} is left from an interrupted run; pass --resume to continue it or --overwrite "
+                     f"to start over")
+    return True
+
+def run_generation(parser: argparse.ArgumentParser, generator: ModuleType, args: argparse.Namespace) -> None:
+    """Runs the advanced or first-person generator as one checkpointed file or as sharded files."""
+    output_format = args.format or infer_format(args.output)
+    if args.shards > 1:
+        check_previous_run(parser, os.path.join(args.output, MANIFEST_FILE), args.resume, args.overwrite)
+        manifest_path = generate_sharded(args.generator, args.rows, args.shards, args.output, args.seed, args.workers,
+                                         args.chunk_size, output_format, args.sampling or "random", args.dedupe,
+                                         args.resume, args.checkpoint_interval, args.progress_interval)
+        logging.info(f"{args.rows} rows written as {args.shards} shards; manifest at {manifest_path}")
+        return
+
+    checkpoint_file = checkpoint_path(args.output)
+    if check_previous_run(parser, checkpoint_file, args.resume, args.overwrite):
+        Checkpoint(checkpoint_file, {}).remove()
+    if output_format == "parquet":
+        logging.warning("A single Parquet file is only checkpointed once complete; use --shards to make a long "
+                        "Parquet run resumable shard by shard")
+    stats = generator.generate_data(args.rows, chunk_size=args.chunk_size, data_file=args.output, seed=args.seed,
+                                    output_format=output_format, sampling=args.sampling or "random",
+                                    dedupe=args.dedupe, checkpoint_file=checkpoint_file,
+                                    checkpoint_interval=args.checkpoint_interval,
+                                    progress_interval=args.progress_interval)
+
+    logging.info("Data Analysis Results:")
+    for key, value in generator.analyze_data(stats).items():
+        logging.info(f"{key}: {value}")
+    for pair, co_occurrence in stats.report()["co_occurrence"].items():
+        logging.info(f"{pair}: {co_occurrence['distinct_pairs']} distinct pairs, most common {co_occurrence['top'][:3]}")
+    logging.info(f"Data for {stats.total_rows} prompts saved to {args.output}")
+
+def run_regeneration(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    """Rebuilds one shard of the sharded run in the --output directory from its manifest."""
+    manifest_path = os.path.join(args.output, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        parser.error(f"nothing to regenerate: {manifest_path} does not exist")
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest["generator"] != args.generator:
+        parser.error(f"{manifest_path} belongs to the {manifest['generator']} generator")
+    if args.regenerate_shard >= len(manifest["shards"]):
+        parser.error(f"--regenerate-shard must be below the run's {len(manifest['shards'])} shards")
+    path = regenerate_shard(manifest_path, args.regenerate_shard)
+    logging.info(f"Shard {args.regenerate_shard} rebuilt at {path}")
+
+def run_enrichment(parser: argparse.ArgumentParser, generator: ModuleType, args: argparse.Namespace) -> None:
+    """Runs the dynamic generator's enrichment pipeline as a checkpointed job."""
+    if (args.format or infer_format(args.output)) != "csv" or args.shards > 1 or args.regenerate_shard is not None:
+        parser.error("the dynamic generator writes a single CSV file")
+    if args.dedupe:
+        parser.error("--dedupe is not supported by the dynamic generator; its default permutation sampling "
+                     "already never repeats a prompt")
+    checkpoint_file = checkpoint_path(args.output)
+    if check_previous_run(parser, checkpoint_file, args.resume, args.overwrite):
+        Checkpoint(checkpoint_file, {}).remove()
+
+    cache = PromptCache(args.cache or generator.CACHE_FILE, args.cache_size)
+    try:
+        written = generator.generate_prompts_batch(
+            args.rows, args.output, args.model or generator.MODEL, args.concurrency, args.timeout, args.retries,
+            args.host, cache, not args.fresh, args.sampling or "permutation", args.seed,
+            checkpoint_file=checkpoint_file, checkpoint_interval=args.checkpoint_interval,
+            progress_interval=args.progress_interval,
+        )
+        logging.info(f"{written} prompts saved to {args.output}")
+        logging.info(f"Cache: {cache.stats()}")
+    finally:
+        cache.close()
+
+def main(argv: Optional[List[str]] = None, generator_name: Optional[str] = None) -> None:
+    parser = build_parser(generator_name)
+    args = parser.parse_args(argv)
+    if generator_name is not None:
+        args.generator = generator_name
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    # The Ollama client logs every HTTP request at INFO; the progress line covers that
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    generator = load_generator(args.generator)
+    if args.output is None:
+        args.output = default_output(args.generator, generator, args.format,
+                                     args.shards > 1 or args.regenerate_shard is not None)
+    try:
+        if args.generator == "dynamic":
+            run_enrichment(parser, generator, args)
+        elif args.regenerate_shard is not None:
+            run_regeneration(parser, args)
+        else:
+            run_generation(parser, generator, args)
+    except ValueError as e:
+        # Mostly a --resume with options that differ from the interrupted run's
+        parser.error(str(e))
+
+if __name__ == "__main__":
+    main()
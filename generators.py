@@ -0,0 +1,23 @@
+import importlib.util
+import os
+from types import ModuleType
+from typing import Dict
+
+# Generator scripts keyed by the short name used on the command line
+GENERATOR_SCRIPTS = {
+    "advanced": "advanced-farming-prompts-generator.py",
+    "first-person": "first-person-farming-prompts-generator.py",
+    "dynamic": "dynamic-farming-prompts-generator.py",
+}
+
+_loaded: Dict[str, ModuleType] = {}
+
+def load_generator(name: str) -> ModuleType:
+    """Imports a generator script by its short name (the file names are not valid module names)."""
+    if name not in _loaded:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), GENERATOR_SCRIPTS[name])
+        spec = importlib.util.spec_from_file_location(name.replace("-", "_") + "_generator", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _loaded[name] = module
+    return _loaded[name]
@@ -0,0 +1,35 @@
+import logging
+import time
+from datetime import timedelta
+
+class Progress:
+    """Logs a single progress line (rows done, throughput, time left) at most every ``interval`` seconds.
+
+    ``done`` is where a resumed run starts; throughput only counts rows made
+    by this run.
+    """
+
+    def __init__(self, total: int, interval: float = 10.0, done: int = 0, label: str = "rows"):
+        self.total = total
+        self.interval = interval
+        self.label = label
+        self.first = done
+        self.start = self.last = time.monotonic()
+
+    def line(self, done: int) -> str:
+        elapsed = time.monotonic() - self.start
+        rate = (done - self.first) / elapsed if elapsed > 0 else 0.0
+        remaining = timedelta(seconds=round((self.total - done) / rate)) if rate else "unknown"
+        return (f"{done:,}/{self.total:,} {self.label} ({done / max(self.total, 1):.1%}) | "
+                f"{rate:,.0f} {self.label}/s | {remaining} left")
+
+    def update(self, done: int) -> None:
+        now = time.monotonic()
+        if now - self.last >= self.interval:
+            self.last = now
+            logging.info(self.line(done))
+
+    def finish(self, done: int) -> None:
+        elapsed = time.monotonic() - self.start
+        logging.info(f"{done - self.first:,} {self.label} in {timedelta(seconds=round(elapsed))} "
+                     f"({(done - self.first) / max(elapsed, 1e-9):,.0f} {self.label}/s)")
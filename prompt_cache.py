@@ -0,0 +1,70 @@
+import hashlib
+import json
+import sqlite3
+import time
+from typing import Any, Dict, Optional
+
+class PromptCache:
+    """On-disk cache of model responses keyed by a hash of (model, instruction, options).
+
+    Entries are evicted least recently used first once more than ``max_entries``
+    are stored. Hit and miss counters cover the lifetime of this instance.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._db = sqlite3.connect(path, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, response TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def make_key(model: str, instruction: str, options: Optional[Dict[str, Any]] = None) -> str:
+        """Returns the content address of one generation request."""
+        payload = json.dumps([model, instruction, options or {}], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, model: str, instruction: str, options: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """Returns the cached response, or None on a miss."""
+        key = self.make_key(model, instruction, options)
+        row = self._db.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    def put(self, model: str, instruction: str, response: str, options: Optional[Dict[str, Any]] = None) -> None:
+        """Stores a response, evicting the least recently used entries beyond max_entries."""
+        key = self.make_key(model, instruction, options)
+        existed = self._db.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone() is not None
+        self._db.execute("INSERT OR REPLACE INTO responses (key, model, response, last_used) VALUES (?, ?, ?, ?)",
+                         (key, model, response, time.time()))
+        if not existed:
+            self._entries += 1
+        if self._entries > self.max_entries:
+            # Another process may share the file, so recount before evicting
+            self._entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            excess = self._entries - self.max_entries
+            if excess > 0:
+                self._db.execute("DELETE FROM responses WHERE key IN "
+                                 "(SELECT key FROM responses ORDER BY last_used LIMIT ?)", (excess,))
+                self._entries -= excess
+
+    def __len__(self) -> int:
+        return self._entries
+
+    def stats(self) -> Dict[str, int]:
+        """Returns hit/miss counters and the number of stored entries."""
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
+
+    def close(self) -> None:
+        self._db.close()
@@ -0,0 +1,258 @@
+import json
+import logging
+import re
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from batch_engine import BatchEngine
+from templates import CompiledTemplate
+
+# Words, keeping hyphenated and apostrophe compounds together ("no-till", "farmer's")
+TOKEN_PATTERN = re.compile(r"\w+(?:[-']\w+)*")
+
+# Characters that can join text on either side of a slot into one token
+JOINING_CHAR = re.compile(r"[\w'-]")
+
+def tokenize(text: str) -> List[str]:
+    """Splits text into lowercase word tokens; phrases and prompts are matched on these."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+class ResponseRules:
+    """Keyword rules compiled into a token trie that finds every matching phrase in one pass.
+
+    Each rule has one or more trigger phrases and a response sentence. A prompt's
+    matches are kept as a bitmask over the rules, and the composed response is
+    the matched sentences in rule order (or the default sentences if none match).
+    Matching costs O(tokens x longest phrase), whatever the number of rules.
+    """
+
+    def __init__(self, rules: Sequence[Dict], default: Sequence[str]):
+        self.responses = [rule["response"] for rule in rules]
+        self.default = " ".join(default)
+        self._trie: Dict = {}
+        self._composed: Dict[int, str] = {0: self.default}
+        # Distinct multi-token phrases, the only ones that can span a template literal and a slot value
+        self._long_phrases = set()
+        for rule_id, rule in enumerate(rules):
+            for phrase in rule["phrases"]:
+                tokens = tuple(tokenize(phrase))
+                if len(tokens) > 1:
+                    self._long_phrases.add(tokens)
+                node = self._trie
+                for token in tokens:
+                    node = node.setdefault(token, {})
+                # The None key holds the mask of rules ending at this node
+                node[None] = node.get(None, 0) | (1 << rule_id)
+
+    def match(self, text: str) -> int:
+        """Returns the bitmask of rules with a phrase occurring in ``text``."""
+        tokens = tokenize(text)
+        trie = self._trie
+        mask = 0
+        for start in range(len(tokens)):
+            node = trie.get(tokens[start])
+            end = start + 1
+            while node is not None:
+                mask |= node.get(None, 0)
+                if end == len(tokens):
+                    break
+                node = node.get(tokens[end])
+                end += 1
+        return mask
+
+    def compose(self, mask: int) -> str:
+        """Joins the responses of the rules in ``mask``, in rule order."""
+        response = self._composed.get(mask)
+        if response is None:
+            parts = []
+            remaining = mask
+            while remaining:
+                lowest = remaining & -remaining
+                parts.append(self.responses[lowest.bit_length() - 1])
+                remaining ^= lowest
+            response = self._composed[mask] = " ".join(parts)
+        return response
+
+    def respond(self, prompt: str) -> str:
+        """Composes the response for a rendered prompt."""
+        return self.compose(self.match(prompt))
+
+    def compile_slots(self, engine: BatchEngine, max_precomputed: int = 100_000) -> None:
+        """Prepares ``respond_indices`` to answer sampled rows without reading their text.
+
+        Rule masks are computed for every template's literal text now, and for
+        each slot's values when the slot is first used: all at once for lists
+        of up to ``max_precomputed`` values, one value at a time (and cached)
+        for larger ones. A phrase that could span a literal and a slot value
+        (e.g. "organic farm" in "a {farm_type} farm") or two slot values would
+        be missed that way, so templates where any phrase might do so are
+        found the first time their rows come up, and those rows are rendered
+        and matched as text instead.
+        """
+        template_masks = []
+        for template in engine.templates:
+            mask = 0
+            for literal in template.literals:
+                mask |= self.match(literal)
+            template_masks.append(mask)
+        self._template_masks = np.asarray(template_masks, dtype=object)
+        self._engine = engine
+        self._max_precomputed = max_precomputed
+        self._text_templates: Dict[int, bool] = {}
+        self._slot_edge_cache: Dict[Tuple[str, int, bool], Optional[Tuple[set, Dict[int, set]]]] = {}
+        self._slot_masks: Dict[str, Union[np.ndarray, Dict[int, int]]] = {}
+
+    def _slot_edges(self, name: str, longest: int, backward: bool) -> Optional[Tuple[set, Dict[int, set]]]:
+        """The token runs a phrase could share with the start (or, ``backward``, the end) of a slot's values.
+
+        Returns every run of up to ``longest`` tokens a value starts with, and
+        the values shorter than that grouped by length, since a phrase can run
+        through those into the next piece. Lists too large to precompute
+        return None and are treated as able to hold anything.
+        """
+        key = (name, longest, backward)
+        if key in self._slot_edge_cache:
+            return self._slot_edge_cache[key]
+        values = self._engine.values[name]
+        if len(values) > self._max_precomputed:
+            self._slot_edge_cache[key] = None
+            return None
+        starts, wholes = set(), {}
+        for value in values:
+            tokens = tokenize(value)
+            if backward:
+                tokens.reverse()
+            for n in range(1, min(len(tokens), longest) + 1):
+                starts.add(tuple(tokens[:n]))
+            if len(tokens) < longest:
+                wholes.setdefault(len(tokens), set()).add(tuple(tokens))
+        self._slot_edge_cache[key] = starts, wholes
+        return starts, wholes
+
+    def _spans_slots(self, template: CompiledTemplate) -> bool:
+        """Whether some phrase could match across a slot boundary of ``template``.
+
+        Each side of every boundary is checked against the literal tokens and
+        the actual slot values. A boundary with no separator between a slot
+        and its neighbour could merge their tokens, so it counts as spanned.
+        """
+        for i, literal in enumerate(template.literals[1:]):
+            before = template.literals[i]
+            joined = (before and JOINING_CHAR.match(before[-1])) or (literal and JOINING_CHAR.match(literal[0]))
+            # Two slots with nothing between them merge too
+            if joined or (not literal and i + 1 < len(template.slots)):
+                return True
+        if not self._long_phrases:
+            return False
+
+        longest = max(len(phrase) for phrase in self._long_phrases)
+        forward: List = [tokenize(template.literals[0])]
+        backward: List = [forward[0][::-1]]
+        for slot, literal in zip(template.slots, template.literals[1:]):
+            forward.extend([self._slot_edges(slot, longest, False), tokenize(literal)])
+            backward.extend([self._slot_edges(slot, longest, True), forward[-1][::-1]])
+
+        def fits(tokens: Tuple[str, ...], side: List) -> bool:
+            """Whether ``tokens`` can be read from the first pieces of ``side`` onwards."""
+            if not tokens:
+                return True
+            if not side:
+                return False
+            piece, rest = side[0], side[1:]
+            if piece is None:
+                return True
+            if isinstance(piece, list):
+                if len(piece) >= len(tokens):
+                    return list(tokens) == piece[:len(tokens)]
+                return piece == list(tokens[:len(piece)]) and fits(tokens[len(piece):], rest)
+            starts, wholes = piece
+            if tokens in starts:
+                return True
+            return any(n < len(tokens) and tokens[:n] in shorter and fits(tokens[n:], rest)
+                       for n, shorter in wholes.items())
+
+        def edge_tokens(side: List) -> Optional[set]:
+            """Tokens that can come first on ``side``, or None if any can."""
+            tokens = set()
+            for piece in side:
+                if piece is None:
+                    return None
+                if isinstance(piece, list):
+                    if piece:
+                        return tokens | {piece[0]}
+                    continue
+                starts, wholes = piece
+                tokens |= {start[0] for start in starts if len(start) == 1}
+                if 0 not in wholes:
+                    return tokens
+            return tokens
+
+        # Phrases keyed by each pair of neighbouring tokens, i.e. each place they could be split
+        splits: Dict[Tuple[str, str], List[Tuple[Tuple[str, ...], int]]] = {}
+        for phrase in self._long_phrases:
+            for split in range(1, len(phrase)):
+                splits.setdefault((phrase[split - 1], phrase[split]), []).append((phrase, split))
+
+        for boundary in range(1, len(forward)):
+            # The left side is read backwards from the boundary
+            left, right = backward[boundary - 1::-1], forward[boundary:]
+            lasts, firsts = edge_tokens(left), edge_tokens(right)
+            for (last, first), candidates in splits.items():
+                if (lasts is not None and last not in lasts) or (firsts is not None and first not in firsts):
+                    continue
+                for phrase, split in candidates:
+                    if fits(phrase[:split][::-1], left) and fits(phrase[split:], right):
+                        return True
+        return False
+
+    def _is_text_template(self, template_id: int) -> bool:
+        """Whether rows of a template are matched as text, worked out the first time the template is used."""
+        spanned = self._text_templates.get(template_id)
+        if spanned is None:
+            template = self._engine.templates[template_id]
+            spanned = self._text_templates[template_id] = self._spans_slots(template)
+            large = [slot for slot in template.slots if len(self._engine.values[slot]) > self._max_precomputed]
+            if spanned and large:
+                logging.warning(f"Template {template_id} uses slots with over {self._max_precomputed:,} values "
+                                f"({', '.join(sorted(set(large)))}), so its responses are matched on the rendered "
+                                f"text, which is several times slower")
+        return spanned
+
+    def _masks_for(self, name: str, slot_idx: np.ndarray) -> np.ndarray:
+        """Rule masks of the values at ``slot_idx``, with 0 for the index -1 of an unused slot."""
+        values = self._engine.values[name]
+        masks = self._slot_masks.get(name)
+        if masks is None:
+            if len(values) <= self._max_precomputed:
+                # A trailing empty mask, so index -1 matches nothing
+                masks = np.asarray([self.match(value) for value in values] + [0], dtype=object)
+            else:
+                masks = {-1: 0}
+            self._slot_masks[name] = masks
+        if isinstance(masks, np.ndarray):
+            return masks[slot_idx]
+        for i in slot_idx.tolist():
+            if i not in masks:
+                masks[i] = self.match(values[i])
+        return np.asarray([masks[i] for i in slot_idx.tolist()], dtype=object)
+
+    def respond_indices(self, indices: Dict[str, np.ndarray]) -> List[str]:
+        """Composes responses for a chunk of sampled rows from their template and slot indices."""
+        masks = self._template_masks[indices["template"]]
+        for name in self._engine.values:
+            masks = masks | self._masks_for(name, indices[name])
+        used = np.flatnonzero(np.bincount(indices["template"], minlength=len(self._engine.templates)))
+        text_templates = np.zeros(len(self._engine.templates), dtype=bool)
+        text_templates[used] = [self._is_text_template(t) for t in used.tolist()]
+        text_rows = np.flatnonzero(text_templates[indices["template"]])
+        if text_rows.size:
+            prompts = self._engine.render({name: idx[text_rows] for name, idx in indices.items()})
+            masks[text_rows] = np.asarray([self.match(prompt) for prompt in prompts], dtype=object)
+        return [self.compose(mask) for mask in masks]
+
+def load_rules(file_path: str) -> ResponseRules:
+    """Loads a rule table: {"default": [sentences], "rules": [{"phrases": [...], "response": "..."}]}."""
+    with open(file_path, 'r') as f:
+        table = json.load(f)
+    return ResponseRules(table["rules"], table["default"])
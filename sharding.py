@@ -0,0 +1,169 @@
+import json
+import logging
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from multiprocessing import Manager
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from checkpoint import Checkpoint, checkpoint_path
+from generators import load_generator
+from progress import Progress
+from sinks import EXTENSIONS
+
+MANIFEST_FILE = "manifest.json"
+
+def shard_seed(master_seed: int, index: int) -> int:
+    """Derives the seed of one shard from the master seed."""
+    return int(np.random.SeedSequence([master_seed, index]).generate_state(1, dtype=np.uint64)[0])
+
+def plan_shards(num_rows: int, num_shards: int, master_seed: int, extension: str = ".csv") -> List[Dict[str, Any]]:
+    """Splits ``num_rows`` into contiguous row ranges, each with its own derived seed."""
+    bounds = np.linspace(0, num_rows, num_shards + 1).astype(int)
+    return [
+        {
+            "index": index,
+            "file": f"shard-{index:05d}{extension}",
+            "start": int(bounds[index]),
+            "stop": int(bounds[index + 1]),
+            "seed": shard_seed(master_seed, index),
+        }
+        for index in range(num_shards)
+    ]
+
+def _run_shard(generator_name: str, path: str, num_rows: int, seed: int, reference_date: str, chunk_size: int,
+               sampling: str, dedupe: bool, shard: Tuple[int, int], space_seed: int,
+               checkpoint: bool = False, checkpoint_interval: float = 60.0,
+               rows_done: Optional[Dict[int, int]] = None) -> Dict[str, Any]:
+    """Generates one shard file in a worker process; returns its slot statistics as a dict.
+
+    With ``checkpoint``, the shard keeps a checkpoint next to its file and
+    continues from it (or returns at once if it finished) when run again.
+    The rows written so far are kept in ``rows_done`` (a dict shared with the
+    parent process) under the shard index, so the parent can log progress.
+    """
+    report_rows = None
+    if rows_done is not None:
+        report_rows = lambda done: rows_done.__setitem__(shard[0], done)
+    generator = load_generator(generator_name)
+    stats = generator.generate_data(num_rows, chunk_size=chunk_size, data_file=path, seed=seed,
+                                    reference_date=datetime.fromisoformat(reference_date), sampling=sampling,
+                                    dedupe=dedupe, shard=shard, space_seed=space_seed,
+                                    checkpoint_file=checkpoint_path(path) if checkpoint else None,
+                                    checkpoint_interval=checkpoint_interval, progress_interval=None,
+                                    report_rows=report_rows)
+    return stats.to_dict()
+
+def _checkpointed_rows(path: str) -> int:
+    """Returns how many rows of a shard its checkpoint records as written, 0 without one."""
+    if not os.path.exists(checkpoint_path(path)):
+        return 0
+    with open(checkpoint_path(path), "r", encoding="utf-8") as f:
+        return json.load(f)["state"]["stats"]["total_rows"]
+
+def _write_manifest(path: str, manifest: Dict[str, Any]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+def generate_sharded(generator_name: str, num_rows: int, num_shards: int, output_dir: str,
+                     master_seed: Optional[int] = None, workers: Optional[int] = None,
+                     chunk_size: int = 100_000, output_format: str = "csv", sampling: str = "random",
+                     dedupe: bool = False, resume: bool = False, checkpoint_interval: float = 60.0,
+                     progress_interval: Optional[float] = 10.0) -> str:
+    """Generates ``num_rows`` rows as shards in a process pool and writes a manifest; returns its path.
+
+    The manifest also holds the statistics report merged across all shards.
+    With the permutation or exhaustive sampling modes, shards interleave over
+    one enumeration keyed by the master seed, so no two shards share a row;
+    dedupe itself only works within a shard.
+
+    Every shard keeps a checkpoint, saved every ``checkpoint_interval``
+    seconds. With ``resume``, an existing manifest in ``output_dir`` is
+    reused: finished shards are kept and the others continue from their
+    checkpoints. A master seed left as None is taken from it. A progress line
+    over all shards is logged every ``progress_interval`` seconds unless it
+    is None.
+    """
+    if num_shards > num_rows:
+        # A shard with no rows would be an empty file that CSV readers cannot load
+        raise ValueError(f"cannot split {num_rows} rows into {num_shards} shards; use at most {num_rows}")
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+    requested = {"generator": generator_name, "num_rows": num_rows, "master_seed": master_seed,
+                 "chunk_size": chunk_size, "output_format": output_format, "sampling": sampling, "dedupe": dedupe}
+    if resume and os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        mismatched = [name for name, value in requested.items() if value is not None and manifest[name] != value]
+        if len(manifest["shards"]) != num_shards:
+            mismatched.append("shard count")
+        if mismatched:
+            raise ValueError(f"{manifest_path} belongs to a run with a different {', '.join(mismatched)}")
+        master_seed = manifest["master_seed"]
+    else:
+        if master_seed is None:
+            master_seed = int(np.random.SeedSequence().entropy % 2**63)
+        os.makedirs(output_dir, exist_ok=True)
+        manifest = {
+            **requested,
+            "master_seed": master_seed,
+            # Generation dates are relative to this day, so shards stay reproducible later on
+            "reference_date": datetime.now().date().isoformat(),
+            "shards": plan_shards(num_rows, num_shards, master_seed, EXTENSIONS[output_format]),
+        }
+        # Checkpoints left by an earlier run into this directory belong to other shards
+        for shard in manifest["shards"]:
+            Checkpoint(checkpoint_path(os.path.join(output_dir, shard["file"])), {}).remove()
+        _write_manifest(manifest_path, manifest)
+
+    paths = [os.path.join(output_dir, shard["file"]) for shard in manifest["shards"]]
+    results: Dict[int, Dict[str, Any]] = {}
+    with Manager() as manager, ProcessPoolExecutor(max_workers=workers) as pool:
+        rows_done = manager.dict({shard["index"]: _checkpointed_rows(path)
+                                  for shard, path in zip(manifest["shards"], paths)})
+        progress = None
+        if progress_interval is not None:
+            progress = Progress(num_rows, progress_interval, sum(rows_done.values()))
+        pending = {
+            pool.submit(_run_shard, generator_name, path, shard["stop"] - shard["start"], shard["seed"],
+                        manifest["reference_date"], chunk_size, sampling, dedupe, (shard["index"], num_shards),
+                        master_seed, True, checkpoint_interval, rows_done): shard
+            for shard, path in zip(manifest["shards"], paths)
+        }
+        while pending:
+            finished, _ = wait(pending, timeout=progress_interval, return_when=FIRST_COMPLETED)
+            for future in finished:
+                shard = pending.pop(future)
+                results[shard["index"]] = future.result()
+                logging.info(f"Shard written to {paths[shard['index']]} ({len(results)}/{num_shards} shards done)")
+            if progress:
+                progress.update(sum(rows_done.values()))
+        if progress:
+            progress.finish(sum(rows_done.values()))
+
+    # Merged in shard order, so the report does not depend on which shard finished first
+    stats = load_generator(generator_name).new_stats()
+    for index in sorted(results):
+        stats.merge(load_generator(generator_name).new_stats().load_dict(results[index]))
+
+    manifest["stats"] = stats.report()
+    _write_manifest(manifest_path, manifest)
+    return manifest_path
+
+def regenerate_shard(manifest_path: str, index: int) -> str:
+    """Rebuilds a single shard from its manifest entry; returns the shard path.
+
+    CSV, JSONL and Parquet shards come out byte for byte. Gzipped JSONL
+    shards hold the same text once decompressed, but not the same bytes,
+    since gzip records the time and the original run started a new gzip
+    member at each of its checkpoints.
+    """
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    shard = manifest["shards"][index]
+    path = os.path.join(os.path.dirname(manifest_path), shard["file"])
+    _run_shard(manifest["generator"], path, shard["stop"] - shard["start"], shard["seed"],
+               manifest["reference_date"], manifest["chunk_size"], manifest["sampling"], manifest["dedupe"],
+               (index, len(manifest["shards"])), manifest["master_seed"])
+    return path
@@ -0,0 +1,185 @@
+import csv
+import gzip
+import io
+import json
+import os
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+# A categorical column: integer codes, -1 for missing, into its values (anything with a ``take`` method)
+Categorical = Tuple[np.ndarray, Any]
+
+class Sink:
+    """Writes generated rows to a file one chunk at a time.
+
+    Each chunk has plain text columns (the rendered prompt and response) and
+    categorical columns (the sampled slot values), given as codes plus their
+    dictionary so formats that support it can store them dictionary-encoded.
+    Writing a chunk is split into ``encode`` (building CSV or JSON text, or an
+    Arrow table) and ``write_encoded`` (file I/O) so each can be timed.
+
+    A resumable sink opened with ``resume_offset`` (the value ``checkpoint``
+    returned) drops whatever was written after that checkpoint and appends.
+    """
+
+    # Whether output can be cut back to a checkpoint and appended to
+    resumable = True
+
+    def __init__(self, path: str, resume_offset: Optional[int] = None):
+        self.path = path
+        if resume_offset is not None:
+            if not self.resumable:
+                raise ValueError(f"{type(self).__name__} output cannot be resumed")
+            # Bytes past the checkpoint belong to rows that are about to be generated again
+            os.truncate(path, resume_offset)
+
+    def encode(self, columns: Dict[str, Sequence[str]], categoricals: Dict[str, Categorical]) -> Any:
+        """Serializes a chunk in memory into what ``write_encoded`` writes out."""
+        raise NotImplementedError
+
+    def write_encoded(self, payload: Any) -> None:
+        raise NotImplementedError
+
+    def checkpoint(self) -> int:
+        """Makes everything written so far durable and returns the offset to resume from."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def _decode(columns: Dict[str, Sequence[str]], categoricals: Dict[str, Categorical]) -> Dict[str, Sequence[str]]:
+    """Expands categorical columns back into their values, after the plain columns; missing values become None."""
+    decoded = dict(columns)
+    for name, (codes, dictionary) in categoricals.items():
+        values = dictionary.take(np.maximum(codes, 0))
+        values[codes < 0] = None
+        decoded[name] = values
+    return decoded
+
+class CsvSink(Sink):
+    def __init__(self, path: str, resume_offset: Optional[int] = None):
+        super().__init__(path, resume_offset)
+        resuming = resume_offset is not None
+        self._file = open(path, "a" if resuming else "w", newline="", encoding="utf-8")
+        self._header_written = resuming
+
+    def encode(self, columns: Dict[str, Sequence[str]], categoricals: Dict[str, Categorical]) -> str:
+        decoded = _decode(columns, categoricals)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if not self._header_written:
+            writer.writerow(decoded)
+            self._header_written = True
+        writer.writerows(zip(*decoded.values()))
+        return buffer.getvalue()
+
+    def write_encoded(self, payload: str) -> None:
+        self._file.write(payload)
+
+    def checkpoint(self) -> int:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return os.path.getsize(self.path)
+
+    def close(self) -> None:
+        self._file.close()
+
+class JsonlSink(Sink):
+    """Writes one JSON object per line, gzip-compressed when the path ends in .gz.
+
+    Compressed output is ended and restarted as a new gzip member at each
+    checkpoint, so a resumed run can cut the file there and append; readers
+    see the members as one stream.
+    """
+
+    def __init__(self, path: str, resume_offset: Optional[int] = None):
+        super().__init__(path, resume_offset)
+        self._file = self._open("a" if resume_offset is not None else "w")
+
+    def _open(self, mode: str):
+        if self.path.endswith(".gz"):
+            return gzip.open(self.path, mode + "t", encoding="utf-8", compresslevel=6)
+        return open(self.path, mode, encoding="utf-8")
+
+    def encode(self, columns: Dict[str, Sequence[str]], categoricals: Dict[str, Categorical]) -> str:
+        decoded = _decode(columns, categoricals)
+        names = list(decoded)
+        lines = [json.dumps(dict(zip(names, row)), ensure_ascii=False) for row in zip(*decoded.values())]
+        return "\n".join(lines) + "\n"
+
+    def write_encoded(self, payload: str) -> None:
+        self._file.write(payload)
+
+    def checkpoint(self) -> int:
+        if self.path.endswith(".gz"):
+            self._file.close()
+            with open(self.path, "rb") as f:
+                os.fsync(f.fileno())
+            self._file = self._open("a")
+        else:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        return os.path.getsize(self.path)
+
+    def close(self) -> None:
+        self._file.close()
+
+class ParquetSink(Sink):
+    """Writes one Parquet row group per chunk, with categorical columns dictionary-encoded."""
+
+    # A Parquet file cannot be reopened for appending
+    resumable = False
+
+    def __init__(self, path: str, resume_offset: Optional[int] = None):
+        super().__init__(path, resume_offset)
+        import pyarrow.parquet as pq
+
+        self._pq = pq
+        self._writer = None
+
+    def encode(self, columns: Dict[str, Sequence[str]], categoricals: Dict[str, Categorical]) -> Any:
+        import pyarrow as pa
+
+        arrays = {name: pa.array(values, type=pa.string()) for name, values in columns.items()}
+        for name, (codes, dictionary) in categoricals.items():
+            # Each row group only carries the values its rows use, however large the full list is
+            present = codes >= 0
+            used, local_codes = np.unique(codes[present], return_inverse=True)
+            chunk_codes = np.zeros(len(codes), dtype=np.int32)
+            chunk_codes[present] = local_codes
+            arrays[name] = pa.DictionaryArray.from_arrays(pa.array(chunk_codes, mask=~present),
+                                                          pa.array(dictionary.take(used), type=pa.string()))
+        return pa.table(arrays)
+
+    def write_encoded(self, table: Any) -> None:
+        if self._writer is None:
+            self._writer = self._pq.ParquetWriter(self.path, table.schema, compression="zstd")
+        self._writer.write_table(table)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+# Output formats and the file extensions they are recognised by
+SINKS = {"csv": CsvSink, "jsonl": JsonlSink, "parquet": ParquetSink}
+EXTENSIONS = {"csv": ".csv", "jsonl": ".jsonl.gz", "parquet": ".parquet"}
+
+def infer_format(path: str) -> str:
+    """Returns the output format implied by a file name."""
+    name = path.lower()
+    if name.endswith((".jsonl", ".jsonl.gz")):
+        return "jsonl"
+    if name.endswith(".parquet"):
+        return "parquet"
+    return "csv"
+
+def open_sink(path: str, output_format: Optional[str] = None, resume_offset: Optional[int] = None) -> Sink:
+    """Opens a sink for ``path``, inferring the format from its extension unless given."""
+    return SINKS[output_format or infer_format(path)](path, resume_offset)
@@ -0,0 +1,156 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+class PairCounts:
+    """Sparse counts of (first, second) index pairs, kept as sorted codes ``first * width + second``.
+
+    Only pairs that occur take space, so two million-entry vocabularies cost
+    memory in proportion to the distinct pairs seen rather than to their
+    product. Added chunks are buffered and folded in once they outgrow what is
+    already stored, which keeps the total sorting cost at O(n log n).
+    """
+
+    def __init__(self, width: int, keys: Optional[np.ndarray] = None, counts: Optional[np.ndarray] = None):
+        self.width = width
+        self._keys = np.asarray(keys if keys is not None else [], dtype=np.int64)
+        self._counts = np.asarray(counts if counts is not None else [], dtype=np.int64)
+        self._pending: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._pending_size = 0
+
+    def add(self, keys: np.ndarray, counts: np.ndarray) -> None:
+        """Adds ``counts`` to the pairs coded as ``keys``."""
+        self._pending.append((keys, counts))
+        self._pending_size += len(keys)
+        if self._pending_size > max(len(self._keys), 1 << 16):
+            self._compact()
+
+    def _compact(self) -> None:
+        if not self._pending:
+            return
+        keys = np.concatenate([self._keys] + [keys for keys, _ in self._pending])
+        counts = np.concatenate([self._counts] + [counts for _, counts in self._pending])
+        self._keys, inverse = np.unique(keys, return_inverse=True)
+        self._counts = np.bincount(inverse, weights=counts, minlength=len(self._keys)).astype(np.int64)
+        self._pending = []
+        self._pending_size = 0
+
+    def items(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the sorted pair codes and their counts."""
+        self._compact()
+        return self._keys, self._counts
+
+    def distinct(self) -> int:
+        return len(self.items()[0])
+
+    def top(self, n: int) -> List[Tuple[int, int, int]]:
+        """The ``n`` most frequent pairs as (first index, second index, count)."""
+        keys, counts = self.items()
+        order = np.argsort(-counts, kind="stable")[:n]
+        return [(int(keys[i] // self.width), int(keys[i] % self.width), int(counts[i])) for i in order]
+
+class SlotStats:
+    """Exact, mergeable statistics over the slot values sampled for generated rows.
+
+    The generator feeds the sampled indices of every chunk to ``update``, so
+    no rendered text is ever scanned. A slot value is only counted for rows
+    whose template actually uses that slot. Accumulators built for separate
+    shards can be combined with ``merge``. Pair co-occurrence is counted
+    sparsely, so its size follows the distinct pairs seen, not the vocabularies.
+    """
+
+    def __init__(self, template_slots: Sequence[Sequence[str]], slot_values: Dict[str, Sequence[str]],
+                 pairs: Sequence[Tuple[str, str]] = ()):
+        self.slot_values = dict(slot_values)
+        # uses[name][t] is True when template t contains slot name
+        self.uses = {name: np.asarray([name in fields for fields in template_slots]) for name in self.slot_values}
+        self.pairs = [tuple(pair) for pair in pairs]
+        self.total_rows = 0
+        self.templates = np.zeros(len(template_slots), dtype=np.int64)
+        self.counts = {name: np.zeros(len(values), dtype=np.int64) for name, values in self.slot_values.items()}
+        self.co_occurrence = {pair: PairCounts(len(self.slot_values[pair[1]])) for pair in self.pairs}
+
+    def update(self, indices: Dict[str, np.ndarray]) -> None:
+        """Adds one chunk of sampled template and slot indices."""
+        template_idx = indices["template"]
+        self.total_rows += len(template_idx)
+        self.templates += np.bincount(template_idx, minlength=len(self.templates))
+        for name, counts in self.counts.items():
+            used = self.uses[name][template_idx]
+            counts += np.bincount(indices[name][used], minlength=len(counts))
+        for (first, second), pairs in self.co_occurrence.items():
+            used = self.uses[first][template_idx] & self.uses[second][template_idx]
+            codes = indices[first][used] * pairs.width + indices[second][used]
+            pairs.add(*np.unique(codes, return_counts=True))
+
+    def merge(self, other: "SlotStats") -> "SlotStats":
+        """Adds the counts of another accumulator over the same templates and slots."""
+        self.total_rows += other.total_rows
+        self.templates += other.templates
+        for name, counts in self.counts.items():
+            counts += other.counts[name]
+        for pair, pairs in self.co_occurrence.items():
+            pairs.add(*other.co_occurrence[pair].items())
+        return self
+
+    def unique(self, *slots: str) -> int:
+        """Number of distinct values seen across slots that share one vocabulary (e.g. crop1 and crop2)."""
+        return int(np.count_nonzero(sum(self.counts[name] for name in slots)))
+
+    def rows_using(self, *slots: str) -> int:
+        """Number of rows whose template mentions any of the given slots."""
+        used = np.zeros(len(self.templates), dtype=bool)
+        for name in slots:
+            used |= self.uses[name]
+        return int(self.templates[used].sum())
+
+    def top(self, name: str, n: int = 5) -> List[Tuple[str, int]]:
+        """Most frequent values of a slot with their counts."""
+        counts = self.counts[name]
+        order = np.argsort(counts)[::-1][:n]
+        return [(self.slot_values[name][i], int(counts[i])) for i in order if counts[i]]
+
+    def report(self, top_n: int = 5) -> Dict[str, Any]:
+        """Summarises the accumulated counts; costs O(slots), not O(rows)."""
+        report = {
+            "total_rows": self.total_rows,
+            "templates": self.templates.tolist(),
+            "slots": {
+                name: {"used": int(counts.sum()), "unique": int(np.count_nonzero(counts)), "top": self.top(name, top_n)}
+                for name, counts in self.counts.items()
+            },
+            "co_occurrence": {},
+        }
+        for (first, second), pairs in self.co_occurrence.items():
+            report["co_occurrence"][f"{first}/{second}"] = {
+                "distinct_pairs": pairs.distinct(),
+                "top": [(self.slot_values[first][r], self.slot_values[second][c], count)
+                        for r, c, count in pairs.top(top_n)],
+            }
+        return report
+
+    def to_dict(self, as_lists: bool = True) -> Dict[str, Any]:
+        """Returns the raw counts in a JSON-serialisable form, e.g. to pass between processes.
+
+        With ``as_lists`` False the counts stay numpy arrays, e.g. for checkpoints.
+        """
+        convert = (lambda counts: counts.tolist()) if as_lists else (lambda counts: counts)
+        return {
+            "total_rows": self.total_rows,
+            "templates": convert(self.templates),
+            "counts": {name: convert(counts) for name, counts in self.counts.items()},
+            "co_occurrence": {f"{a}/{b}": {"keys": convert(pairs.items()[0]), "counts": convert(pairs.items()[1])}
+                              for (a, b), pairs in self.co_occurrence.items()},
+        }
+
+    def load_dict(self, data: Dict[str, Any]) -> "SlotStats":
+        """Replaces the counts with ones produced by ``to_dict`` on a matching accumulator."""
+        self.total_rows = data["total_rows"]
+        self.templates = np.asarray(data["templates"], dtype=np.int64)
+        self.counts = {name: np.asarray(counts, dtype=np.int64) for name, counts in data["counts"].items()}
+        self.co_occurrence = {}
+        for key, pairs in data["co_occurrence"].items():
+            first, second = key.split("/")
+            self.co_occurrence[(first, second)] = PairCounts(len(self.slot_values[second]), pairs["keys"],
+                                                              pairs["counts"])
+        return self
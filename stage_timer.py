@@ -0,0 +1,24 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+class StageTimer:
+    """Accumulates wall-clock seconds per named stage of a generation run.
+
+    Stages are timed once per chunk, not per row, so keeping a timer on every
+    run costs nothing measurable.
+    """
+
+    def __init__(self):
+        self.totals: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.totals[name] = self.totals.get(name, 0.0) + time.perf_counter() - start
+
+    def to_dict(self) -> Dict[str, float]:
+        return dict(self.totals)
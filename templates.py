@@ -0,0 +1,50 @@
+import string
+from typing import Collection, Dict, List, Sequence, Tuple
+
+class CompiledTemplate:
+    """A prompt template parsed once into literal text segments and the slots between them.
+
+    ``literals`` has one more entry than ``slots``: rendering interleaves them,
+    starting and ending with a literal, so no format string is parsed per row.
+    """
+
+    __slots__ = ("text", "literals", "slots", "required")
+
+    def __init__(self, text: str, literals: Tuple[str, ...], slots: Tuple[str, ...]):
+        self.text = text
+        self.literals = literals
+        self.slots = slots
+        # Each slot is sampled once per row, even if the template repeats it
+        self.required = tuple(dict.fromkeys(slots))
+
+    def render(self, values: Dict[str, str]) -> str:
+        """Fills the slots from ``values``, which needs an entry for every required slot."""
+        literals = self.literals
+        parts = [literals[0]]
+        for slot, literal in zip(self.slots, literals[1:]):
+            parts.append(values[slot])
+            parts.append(literal)
+        return "".join(parts)
+
+    def __repr__(self) -> str:
+        return f"CompiledTemplate({self.text!r})"
+
+def compile_template(text: str, slot_names: Collection[str]) -> CompiledTemplate:
+    """Parses a str.format template, rejecting slots that are unknown or use format specs."""
+    literals = [""]
+    slots = []
+    for literal, field, format_spec, conversion in string.Formatter().parse(text):
+        literals[-1] += literal
+        if field is None:
+            continue
+        if field not in slot_names:
+            raise ValueError(f"Unknown slot '{field}' in template: {text}")
+        if format_spec or conversion:
+            raise ValueError(f"Slot '{field}' has an unsupported format spec or conversion in template: {text}")
+        slots.append(field)
+        literals.append("")
+    return CompiledTemplate(text, tuple(literals), tuple(slots))
+
+def compile_templates(templates: Sequence[str], slots: Collection[str]) -> List[CompiledTemplate]:
+    """Compiles every template up front so a bad template fails at startup, not mid-run."""
+    return [compile_template(text, slots) for text in templates]
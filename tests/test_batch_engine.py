@@ -0,0 +1,25 @@
+import os
+
+import numpy as np
+import pytest
+
+from batch_engine import BatchEngine
+from entity_catalog import EntityCatalog
+from response_rules import load_rules
+
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_slot_without_values_is_refused_at_startup():
+    with pytest.raises(ValueError, match="Slots without any values: y"):
+        BatchEngine(["a {x} b {y}"], {"x": ["1"], "y": []})
+
+def test_catalog_lists_load_on_first_use():
+    catalog = EntityCatalog(DATA_DIR)
+    engine = BatchEngine(["An {farm_type} farm growing {crop} wants {goal}."],
+                         {"farm_type": catalog["farm_types"], "crop": catalog["crops"], "goal": catalog["goals"]})
+    rules = load_rules(os.path.join(DATA_DIR, "response-rules.json"))
+    rules.compile_slots(engine)
+    assert all(entry._values is None for entry in catalog._entries.values())
+
+    rules.respond_indices(engine.sample(100, np.random.default_rng(0)))
+    assert all(entry._values is not None for entry in catalog._entries.values())
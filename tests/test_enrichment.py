@@ -0,0 +1,100 @@
+import asyncio
+import csv
+import random
+import time
+
+import ollama
+import pytest
+
+from checkpoint import Checkpoint
+from enrichment import enrich_prompt, enrich_prompts
+from fake_ollama_server import start_server
+
+BASE_PROMPTS = [f"How can a farm in region {i} improve soil health?" for i in range(40)]
+
+class Interrupted(Exception):
+    pass
+
+@pytest.fixture
+def ollama_server():
+    """Starts a stand-in Ollama server; tests set ``failure_rate`` on it as needed."""
+    server, host = start_server(latency=0.0)
+    yield server, host
+    server.shutdown()
+    server.server_close()
+
+class CountingClient:
+    """Passes requests to a real client, counting them."""
+
+    def __init__(self, host: str):
+        self.client = ollama.AsyncClient(host=host)
+        self.calls = 0
+
+    async def generate(self, **kwargs):
+        self.calls += 1
+        return await self.client.generate(**kwargs)
+
+def read_rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+def test_failed_requests_are_retried_then_fall_back_to_the_base_prompt(ollama_server):
+    server, host = ollama_server
+    server.failure_rate = 1.0
+    client = CountingClient(host)
+
+    start = time.monotonic()
+    result = asyncio.run(enrich_prompt(client, "base prompt", "instruction", "model", timeout=5.0, retries=3,
+                                       backoff=0.05))
+    elapsed = time.monotonic() - start
+
+    assert result == "base prompt"
+    assert client.calls == 4
+    # Backoff doubles after each failure: 0.05 + 0.1 + 0.2 seconds
+    assert elapsed >= 0.35
+
+def test_retries_recover_from_intermittent_failures(ollama_server, tmp_path):
+    server, host = ollama_server
+    server.failure_rate = 0.5
+    random.seed(0)
+    output_file = str(tmp_path / "enhanced.csv")
+
+    written = asyncio.run(enrich_prompts(BASE_PROMPTS, lambda prompt: prompt, output_file, "model", concurrency=4,
+                                         retries=20, backoff=0.0, host=host))
+
+    assert written == len(BASE_PROMPTS)
+    for row in read_rows(output_file):
+        assert row["Enhanced Prompt"] == f"Enhanced: {row['Base Prompt']}"
+
+def test_resumed_run_writes_every_prompt_once(ollama_server, tmp_path):
+    _, host = ollama_server
+    output_file = str(tmp_path / "enhanced.csv")
+    checkpoint_file = output_file + ".checkpoint.json"
+    calls = []
+
+    def failing_instruction(prompt):
+        calls.append(prompt)
+        if len(calls) == 15:
+            raise Interrupted()
+        return prompt
+
+    with pytest.raises(Interrupted):
+        asyncio.run(enrich_prompts(BASE_PROMPTS, failing_instruction, output_file, "model", concurrency=4,
+                                   host=host, checkpoint=Checkpoint(checkpoint_file, {}), checkpoint_interval=0.0))
+    state, complete = Checkpoint(checkpoint_file, {}).load()
+    checkpointed = set(state["done"].tolist())
+    assert not complete and 0 < len(checkpointed) < len(BASE_PROMPTS)
+
+    resumed = []
+    written = asyncio.run(enrich_prompts(BASE_PROMPTS, lambda prompt: resumed.append(prompt) or prompt, output_file,
+                                         "model", concurrency=4, host=host,
+                                         checkpoint=Checkpoint(checkpoint_file, {}), checkpoint_interval=0.0))
+
+    rows = read_rows(output_file)
+    assert written == len(BASE_PROMPTS)
+    assert sorted(int(row["Index"]) for row in rows) == list(range(len(BASE_PROMPTS)))
+    for row in rows:
+        assert row["Base Prompt"] == BASE_PROMPTS[int(row["Index"])]
+        assert row["Enhanced Prompt"] == f"Enhanced: {row['Base Prompt']}"
+    # Prompts checkpointed before the interruption are not sent again
+    assert not checkpointed & {BASE_PROMPTS.index(prompt) for prompt in resumed}
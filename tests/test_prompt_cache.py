@@ -0,0 +1,56 @@
+import time
+
+import pytest
+
+from prompt_cache import PromptCache
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = PromptCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+    yield cache
+    cache.close()
+
+def put_in_order(cache, *instructions):
+    for instruction in instructions:
+        cache.put("model", instruction, f"response to {instruction}")
+        # Recency is ordered by timestamp, so keep them apart
+        time.sleep(0.01)
+
+def test_hits_and_misses_are_counted(cache):
+    assert cache.get("model", "a") is None
+    put_in_order(cache, "a")
+    assert cache.get("model", "a") == "response to a"
+    assert cache.get("model", "a", {"temperature": 0.2}) is None
+    assert cache.get("other model", "a") is None
+    assert cache.stats() == {"hits": 1, "misses": 3, "entries": 1}
+
+def test_least_recently_used_entry_is_evicted(cache):
+    put_in_order(cache, "a", "b")
+    # Reading "a" makes "b" the least recently used
+    assert cache.get("model", "a") is not None
+    time.sleep(0.01)
+    put_in_order(cache, "c")
+
+    assert len(cache) == 2
+    assert cache.get("model", "b") is None
+    assert cache.get("model", "a") == "response to a"
+    assert cache.get("model", "c") == "response to c"
+
+def test_replacing_an_entry_does_not_evict(cache):
+    put_in_order(cache, "a", "b", "a")
+    assert len(cache) == 2
+    assert cache.get("model", "b") == "response to b"
+
+def test_entries_persist_across_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    first = PromptCache(path)
+    put_in_order(first, "a", "b")
+    first.close()
+
+    second = PromptCache(path)
+    try:
+        assert len(second) == 2
+        assert second.get("model", "b") == "response to b"
+        assert second.stats() == {"hits": 1, "misses": 0, "entries": 2}
+    finally:
+        second.close()
@@ -0,0 +1,129 @@
+import csv
+import gzip
+import os
+import shutil
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from coverage_sampler import Permutation
+from generate import main as cli_main
+from generators import load_generator
+from sharding import generate_sharded, regenerate_shard
+from stage_timer import StageTimer
+
+REFERENCE_DATE = datetime(2024, 6, 1)
+
+class Interrupted(Exception):
+    pass
+
+class InterruptingTimer(StageTimer):
+    """Stops a run right after its ``after``-th chunk is written, before that chunk is checkpointed."""
+
+    def __init__(self, after: int):
+        super().__init__()
+        self.after = after
+        self.writes = 0
+
+    @contextmanager
+    def stage(self, name):
+        with super().stage(name):
+            yield
+        if name == "write":
+            self.writes += 1
+            if self.writes == self.after:
+                raise Interrupted()
+
+def read_output(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        return f.read()
+
+def baseline_fake_response(prompt):
+    """The keyword checks the generators started out with, kept as the reference for the rule engine."""
+    words = prompt.lower().split()
+    response_parts = []
+    if "organic" in words:
+        response_parts.append("Consider implementing organic pest control methods and natural fertilizers.")
+    if "climate change" in prompt.lower():
+        response_parts.append("Adapt crop varieties and planting schedules to changing climate patterns.")
+    if "water scarcity" in prompt.lower():
+        response_parts.append("Implement water-efficient irrigation systems like drip irrigation or rainwater harvesting.")
+    if "soil health" in prompt.lower():
+        response_parts.append("Focus on building organic matter through cover cropping and minimal tillage.")
+    if "biodiversity" in prompt.lower():
+        response_parts.append("Integrate polyculture systems and create habitat corridors for beneficial insects and wildlife.")
+    if not response_parts:
+        response_parts.append("Implement sustainable farming practices tailored to your specific crop and location.")
+        response_parts.append("Consult with local agricultural extension services for region-specific advice.")
+    return " ".join(response_parts)
+
+@pytest.mark.parametrize("n", [1, 2, 10, 1000, 4097])
+def test_permutation_is_a_bijection(n):
+    codes = Permutation(n, seed=3)(np.arange(n, dtype=np.uint64))
+    assert sorted(codes.tolist()) == list(range(n))
+
+@pytest.mark.parametrize("file_name, sampling, dedupe", [
+    ("rows.csv", "random", False),
+    ("rows.jsonl.gz", "stratified", True),
+    ("rows.csv", "permutation", True),
+    ("rows.jsonl.gz", "permutation", False),
+])
+def test_resume_after_interruption_is_byte_identical(tmp_path, file_name, sampling, dedupe):
+    generator = load_generator("advanced")
+    options = dict(chunk_size=200, seed=11, reference_date=REFERENCE_DATE, sampling=sampling, dedupe=dedupe,
+                   checkpoint_interval=0.0, progress_interval=None)
+    expected = str(tmp_path / ("expected-" + file_name))
+    generator.generate_data(2000, data_file=expected, checkpoint_file=expected + ".checkpoint.json", **options)
+
+    resumed = str(tmp_path / file_name)
+    with pytest.raises(Interrupted):
+        generator.generate_data(2000, data_file=resumed, checkpoint_file=resumed + ".checkpoint.json",
+                                timer=InterruptingTimer(after=4), **options)
+    stats = generator.generate_data(2000, data_file=resumed, checkpoint_file=resumed + ".checkpoint.json", **options)
+
+    assert stats.total_rows == 2000
+    assert read_output(resumed) == read_output(expected)
+
+def test_permutation_shards_do_not_overlap_and_regenerate_byte_for_byte(tmp_path):
+    output_dir = str(tmp_path / "shards")
+    manifest_path = generate_sharded("advanced", 3000, 3, output_dir, master_seed=7, workers=2,
+                                     chunk_size=400, sampling="permutation")
+
+    rows = []
+    for index in range(3):
+        with open(os.path.join(output_dir, f"shard-{index:05d}.csv"), newline="", encoding="utf-8") as f:
+            # Everything but the generation date, which is drawn independently of the row
+            rows.extend(tuple(value for name, value in row.items() if name != "Generation Date")
+                        for row in csv.DictReader(f))
+    assert len(rows) == 3000
+    assert len(set(rows)) == len(rows)
+
+    path = os.path.join(output_dir, "shard-00001.csv")
+    shutil.move(path, path + ".original")
+    assert regenerate_shard(manifest_path, 1) == path
+    assert read_output(path) == read_output(path + ".original")
+
+def test_regenerate_shard_from_the_command_line(tmp_path):
+    output_dir = str(tmp_path / "shards")
+    options = ["first-person", "--output", output_dir, "--format", "jsonl"]
+    cli_main(options + ["--rows", "900", "--shards", "3", "--seed", "5", "--workers", "1"])
+
+    # Compressed shards match once decompressed; gzip headers carry the time they were written
+    path = os.path.join(output_dir, "shard-00002.jsonl.gz")
+    original = os.path.join(output_dir, "original.jsonl.gz")
+    shutil.move(path, original)
+    cli_main(options + ["--regenerate-shard", "2"])
+    assert read_output(path) == read_output(original)
+
+@pytest.mark.parametrize("name", ["advanced", "first-person"])
+def test_rule_paths_match_the_baseline_responses(name):
+    generator = load_generator(name)
+    indices = generator.BATCH_ENGINE.sample(5000, np.random.default_rng(0))
+    prompts = generator.BATCH_ENGINE.render(indices)
+    expected = [baseline_fake_response(prompt) for prompt in prompts]
+
+    assert [generator.generate_fake_response(prompt) for prompt in prompts] == expected
+    assert generator.RESPONSE_RULES.respond_indices(indices) == expected